@@ -0,0 +1,44 @@
+# benchmarks/bench_augmenter.py
+import argparse
+import os
+import sys
+import time
+
+import torch
+from torch_geometric.data import Batch, Data
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from engine.data_augmenter import GraphAugmenter, augment_node_coordinates
+
+def rate(fn, count):
+    start = time.perf_counter()
+    fn()
+    return count / (time.perf_counter() - start)
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare per-row and batched node augmentation')
+    parser.add_argument('--graphs', type=int, default=2000)
+    parser.add_argument('--nodes', type=int, default=100)
+    parser.add_argument('--legacy-graphs', type=int, default=50,
+                        help='number of graphs pushed through the per-row torchvision path')
+    args = parser.parse_args()
+
+    graphs = [Data(x=torch.rand(args.nodes, 2) * 1000, edge_index=torch.zeros(2, 0, dtype=torch.long))
+              for _ in range(args.graphs)]
+    augmenter = GraphAugmenter(jitter=0.5)
+
+    # torchvision's rotation needs [C, H, W] input, so each coordinate row goes in as a 1x2 image
+    legacy = rate(lambda: [augment_node_coordinates(g.x.numpy()[:, None, :]) for g in graphs[:args.legacy_graphs]],
+                  args.legacy_graphs)
+    per_graph = rate(lambda: [augmenter(g) for g in graphs], args.graphs)
+    batch = Batch.from_data_list(graphs)
+    batched = rate(lambda: augmenter(batch), args.graphs)
+
+    print(f'{args.nodes} nodes per graph')
+    print(f'augment_node_coordinates: {legacy:12.1f} graphs/sec')
+    print(f'GraphAugmenter per graph: {per_graph:12.1f} graphs/sec ({per_graph / legacy:.0f}x)')
+    print(f'GraphAugmenter on Batch:  {batched:12.1f} graphs/sec ({batched / legacy:.0f}x)')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,47 @@
+# benchmarks/bench_graph_constructor.py
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.synthetic import synthesize_segments
+from engine.graph_constructor import process_data, process_data_iterrows
+
+def time_call(fn, *args, repeat=3):
+    best = float('inf')
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn(*args)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare iterrows and vectorized process_data')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000])
+    parser.add_argument('--legacy-max', type=int, default=10000,
+                        help='skip the O(N^2) iterrows path above this many segments')
+    args = parser.parse_args()
+
+    print(f"{'segments':>10} {'nodes':>8} {'iterrows (s)':>14} {'vectorized (s)':>16} {'speedup':>9}")
+    for size in args.sizes:
+        frame = synthesize_segments(size)
+        fast_time, (_, fast_edges, fast_features) = time_call(process_data, [frame])
+
+        if size <= args.legacy_max:
+            slow_time, (_, slow_edges, slow_features) = time_call(process_data_iterrows, [frame], repeat=1)
+            assert np.array_equal(slow_edges, fast_edges) and np.array_equal(slow_features, fast_features)
+            slow_text = f'{slow_time:14.4f}'
+            speedup_text = f'{slow_time / fast_time:8.1f}x'
+        else:
+            slow_text = f"{'skipped':>14}"
+            speedup_text = f"{'-':>9}"
+
+        print(f'{size:>10} {len(fast_features):>8} {slow_text} {fast_time:16.4f} {speedup_text}')
+
+if __name__ == '__main__':
+    main()
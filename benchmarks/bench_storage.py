@@ -0,0 +1,53 @@
+# benchmarks/bench_storage.py
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import torch
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.synthetic import synthesize_segments
+from engine.graph_constructor import process_data, create_graph
+from engine.storage import save_graph, load_graph, zstandard, lz4
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare processed-graph file size and load time per storage format')
+    parser.add_argument('--graphs', type=int, default=200)
+    parser.add_argument('--segments', type=int, default=2000)
+    args = parser.parse_args()
+
+    graphs = []
+    for seed in range(args.graphs):
+        _, edges, node_features = process_data([synthesize_segments(args.segments, seed=seed)])
+        graphs.append(create_graph(node_features, edges))
+
+    configs = [('plain', None, None), ('float16', 'float16', None), ('quant16', 'quant16', None)]
+    if zstandard is not None:
+        configs += [('float16+zstd', 'float16', 'zstd'), ('quant16+zstd', 'quant16', 'zstd')]
+    if lz4 is not None:
+        configs += [('float16+lz4', 'float16', 'lz4')]
+
+    print(f"{'format':>14} {'total MB':>10} {'ratio':>7} {'load (s)':>9} {'max |dx| px':>12}")
+    baseline = None
+    for name, x_dtype, compression in configs:
+        with tempfile.TemporaryDirectory() as directory:
+            paths = [os.path.join(directory, f'data_{i}.pt') for i in range(len(graphs))]
+            for graph, path in zip(graphs, paths):
+                save_graph(graph, path, x_dtype=x_dtype, compression=compression)
+            size = sum(os.path.getsize(path) for path in paths)
+
+            start = time.perf_counter()
+            loaded = [load_graph(path) for path in paths]
+            elapsed = time.perf_counter() - start
+
+        error = max(float((a.x - b.x).abs().max()) for a, b in zip(graphs, loaded))
+        assert all(torch.equal(a.edge_index, b.edge_index) and b.edge_index.dtype == torch.long
+                   for a, b in zip(graphs, loaded))
+        baseline = baseline or size
+        print(f'{name:>14} {size / 1e6:10.2f} {baseline / size:6.2f}x {elapsed:9.3f} {error:12.4f}')
+
+if __name__ == '__main__':
+    main()
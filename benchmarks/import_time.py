@@ -0,0 +1,71 @@
+# benchmarks/import_time.py
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# (label, python arguments) run from the repository root
+COMMANDS = [
+    ('import main', ['-c', 'import main']),
+    ('import engine.dataset', ['-c', 'import engine.dataset']),
+    ('main.py --help', ['main.py', '--help']),
+    ('main.py inspect', ['main.py', 'inspect']),
+    ('main.py stats', ['main.py', 'stats']),
+]
+
+def parse_importtime(stderr):
+    # Lines look like "import time:  self [us] | cumulative | imported package", nested
+    # imports indented under their parent. Total is the sum of the top-level cumulative
+    # times; the per-package breakdown sums self times, so nothing is counted twice.
+    packages = {}
+    total = 0
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        own, cumulative, name = line[len('import time:'):].split('|')
+        if not name.startswith('  '):
+            total += int(cumulative) / 1e6
+        package = name.strip().split('.')[0]
+        packages[package] = packages.get(package, 0) + int(own) / 1e6
+    return total, packages
+
+def measure(args, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = subprocess.run([sys.executable, '-X', 'importtime'] + args, cwd=REPO,
+                                capture_output=True, text=True)
+        wall = time.perf_counter() - start
+        if best is None or wall < best['wall']:
+            imports, packages = parse_importtime(result.stderr)
+            best = {'wall': wall, 'imports': imports, 'returncode': result.returncode, 'packages': packages}
+    return best
+
+def main():
+    parser = argparse.ArgumentParser(description='Startup and import time of main.py and the engine')
+    parser.add_argument('--repeat', type=int, default=3, help='best of N runs per command')
+    parser.add_argument('--top', type=int, default=5, help='heaviest packages to list per command')
+    parser.add_argument('--output', default=None, help='optional JSON path for the full report')
+    args = parser.parse_args()
+
+    report = {}
+    for label, command in COMMANDS:
+        result = measure(command, args.repeat)
+        report[label] = result
+        status = '' if result['returncode'] == 0 else f"  (exit {result['returncode']})"
+        print(f"{label:<22} wall {result['wall']:6.2f}s  imports {result['imports']:6.2f}s{status}")
+        heaviest = sorted(result['packages'].items(), key=lambda item: -item[1])[:args.top]
+        for name, seconds in heaviest:
+            print(f'    {name:<30} {seconds:6.3f}s')
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print(f'Report written to {args.output}')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,115 @@
+# benchmarks/run.py
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import torch
+
+from benchmarks.synthetic import write_corpus
+from engine.data_loader import load_data, read_data
+from engine.data_normalizer import normalize_features
+from engine.dataset import PoseGraphDataset
+from engine.graph_constructor import process_data, create_graph
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def commit_id():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=REPO, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+def best_of(fn, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+def bench_size(directory, num_files, num_segments, repeat):
+    paths = write_corpus(directory, num_files, num_segments)
+    pattern = os.path.join(directory, 'csv_data', '*.csv')
+    frames = [read_data(path) for path in paths]
+    processed = [process_data([frame]) for frame in frames]
+    normalized = [normalize_features(features) for _, _, features in processed]
+
+    results = {
+        'load_data': best_of(lambda: load_data(pattern), repeat),
+        'load_data_lazy': best_of(lambda: list(load_data(pattern, lazy=True)), repeat),
+        'process_data': best_of(lambda: [process_data([frame]) for frame in frames], repeat),
+        'normalize_features': best_of(lambda: [normalize_features(f) for _, _, f in processed], repeat),
+        'create_graph': best_of(lambda: [create_graph(x, edges) for x, (_, edges, _) in zip(normalized, processed)],
+                                repeat),
+    }
+
+    def process():
+        shutil.rmtree(os.path.join(directory, 'processed'), ignore_errors=True)
+        with contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(io.StringIO()):
+            PoseGraphDataset(directory)
+
+    results['dataset_process'] = best_of(process, repeat)
+    with contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(io.StringIO()):
+        dataset = PoseGraphDataset(directory)
+    results['dataset_get'] = best_of(lambda: [dataset[i] for i in range(len(dataset))], repeat)
+    return results
+
+def compare(current, baseline):
+    print(f"\nCompared with {baseline['commit']} (ratio < 1 is faster)")
+    for size, stages in current['results'].items():
+        for stage, seconds in stages.items():
+            before = baseline['results'].get(size, {}).get(stage)
+            if before:
+                print(f'{size:>8} {stage:<20} {seconds / before:6.2f}x')
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the graph preprocessing hot paths on synthetic plans')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[100, 1000, 10000], help='segments per CSV')
+    parser.add_argument('--files', type=int, default=20, help='CSV files per size')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--output', default=None, help='JSON path (default benchmarks/results/<commit>.json)')
+    parser.add_argument('--compare', default=None, help='earlier results JSON to compare against')
+    args = parser.parse_args()
+
+    commit = commit_id()
+    report = {
+        'commit': commit,
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'torch': torch.__version__,
+        'threads': torch.get_num_threads(),
+        'files': args.files,
+        'results': {},
+    }
+
+    print(f"{'segments':>8} {'stage':<20} {'seconds':>10} {'per file ms':>12}")
+    for size in args.sizes:
+        with tempfile.TemporaryDirectory() as directory:
+            results = bench_size(directory, args.files, size, args.repeat)
+        report['results'][str(size)] = results
+        for stage, seconds in results.items():
+            print(f'{size:>8} {stage:<20} {seconds:>10.4f} {seconds / args.files * 1000:>12.2f}')
+
+    output = args.output or os.path.join(REPO, 'benchmarks', 'results', f'{commit}.json')
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    print(f'Results written to {output}')
+
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            compare(report, json.load(f))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,39 @@
+# benchmarks/synthetic.py
+import os
+import numpy as np
+import pandas as pd
+
+COLUMNS = ['Index', 'Start X', 'Start Y', 'End X', 'End Y', 'Image Width', 'Image Height']
+
+def synthesize_segments(num_segments, width=1024, height=846, seed=0):
+    # Wall-like polylines: every segment starts where the previous one ended,
+    # and a new polyline branches off an existing junction every few segments
+    rng = np.random.default_rng(seed)
+    points = [rng.uniform(0, [width, height])]
+    rows = []
+    current = points[0]
+    for i in range(num_segments):
+        if i % 8 == 0 and i > 0:
+            current = points[rng.integers(len(points))]
+        step = rng.uniform(5, 60)
+        if rng.random() < 0.5:
+            nxt = current + [rng.choice([-step, step]), 0.0]
+        else:
+            nxt = current + [0.0, rng.choice([-step, step])]
+        nxt = np.clip(nxt, 0, [width, height])
+        points.append(nxt)
+        rows.append([i, current[0], current[1], nxt[0], nxt[1], width, height])
+        current = nxt
+    return pd.DataFrame(rows, columns=COLUMNS)
+
+
+def write_corpus(directory, num_files, num_segments, seed=0):
+    # A csv_data-style folder of synthetic plans; returns the CSV paths
+    csv_dir = os.path.join(directory, 'csv_data')
+    os.makedirs(csv_dir, exist_ok=True)
+    paths = []
+    for i in range(num_files):
+        path = os.path.join(csv_dir, f'SYN_{num_segments}_{i:05d}.csv')
+        synthesize_segments(num_segments, seed=seed + i).to_csv(path, index=False)
+        paths.append(path)
+    return paths
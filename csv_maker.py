@@ -1,64 +1,149 @@
 import os
-import json
+import sys
+import time
+import argparse
+import concurrent.futures
+import numpy as np
 import pandas as pd
-from math import sqrt
+from engine.data_loader import SEGMENT_COLUMNS, IMAGE_COLUMNS, JSON_PARSERS, get_parser
+from engine.graph_constructor import annotation_size
 
 json_dir = './json_folder'
 output_dir = './csv_folder'
+# Start X/Start Y/End X/End Y files in the layout engine/graph_constructor reads (root/csv_data)
+segments_dir = './csv_data'
 
 # Desired junction types
 desired_junctions = ['junc_I_open', 'junc_I_normal', 'junc_I_isolation', 'junc_I', 'junc_L', 'junc_T', 'junc_X']
 
-# Create the output directory if it doesn't exist
-os.makedirs(output_dir, exist_ok=True)
-
-# Iterate through each JSON file in the directory
-for json_file in os.listdir(json_dir):
-    with open(os.path.join(json_dir, json_file)) as f:
-        data = json.load(f)
-        
-        # Extract junctions and walls from the JSON data
-        junctions = {junction['id']: junction for junction in data['annotations'][0]['junctions']}
-        walls = {wall['start']: wall for wall in data['annotations'][0]['walls']}
-        
-        # Create a list to store data for each junction
-        rows = []
-        for junction_id, junction in junctions.items():
-            junction_type = junction['type']
-            
-            # Check if the junction type is in the desired junction types
-            if junction_type in desired_junctions:
-                position = junction['position']
-                x = position['x']
-                y = position['y']
-                
-                for connection in walls.items():
-                    connected_from = connection[1]['start']
-                    connected_to = connection[1]['end']
-                    connection_length = connection[1]['length']
-                    euclidean_distance = connection[1]['euclidean_distance']
-                    if connected_from and connected_to == junction_id:
-                        from_x = x
-                        from_y = y
-                        to_x = x
-                        to_y = y
-                        #print(from_x, from_y, to_x, to_y)
-                        #print(connected_from, connected_to, connection_length, euclidean_distance)
-                        #print(connection)
-
-                    #print(connected_from, connected_to, connection_length, euclidean_distance)
-                        #print(connection)
-                        
-                        rows.append([json_file, junction_type, junction_id, x, y, connected_from, connected_to, from_x, from_y, to_x, to_y, euclidean_distance])
-        print(rows)
-        # Create a DataFrame from the collected data
-        df = pd.DataFrame(rows, columns=['json_file', 'junction_type', 'junction_id', 'x', 'y', 
-                                         'connected_from', 'connected_to', 'from_x', 'from_y', 
-                                        'to_x', 'to_y', 'euclidean_distance'])
-        
-        # Save the DataFrame to a CSV file
-        output_filename = os.path.splitext(json_file)[0] + '_junctions.csv'
-        output_path = os.path.join(output_dir, output_filename)
-        df.to_csv(output_path, index=False)
-
-print("CSV files created successfully.")
+JUNCTION_COLUMNS = ['json_file', 'junction_type', 'junction_id', 'x', 'y',
+                    'connected_from', 'connected_to', 'from_x', 'from_y',
+                    'to_x', 'to_y', 'euclidean_distance']
+CSV_COLUMNS = ['Index'] + SEGMENT_COLUMNS + IMAGE_COLUMNS
+
+def extract(data, json_file):
+    # One pass over a parsed annotation file, returning two frames:
+    #   junctions  one row per (desired junction, wall touching it at either end)
+    #   segments   one row per wall whose two junctions are known, in the csv_data schema
+    # Walls are joined to junction positions by id lookups, so the cost is linear in the
+    # number of junctions and walls.
+    annotation = data['annotations'][0]
+    junctions = pd.DataFrame(
+        [(junction['id'], junction['type'], junction['position']['x'], junction['position']['y'])
+         for junction in annotation['junctions']],
+        columns=['junction_id', 'junction_type', 'x', 'y'])
+    walls = pd.DataFrame(
+        [(wall['start'], wall['end'], wall['euclidean_distance']) for wall in annotation['walls']],
+        columns=['connected_from', 'connected_to', 'euclidean_distance'])
+
+    # Later junctions with a repeated id win, as they did in the old id -> junction dict
+    positions = junctions.drop_duplicates('junction_id', keep='last').set_index('junction_id')[['x', 'y']]
+    start = positions.reindex(walls['connected_from']).to_numpy(dtype=np.float64)
+    end = positions.reindex(walls['connected_to']).to_numpy(dtype=np.float64)
+    walls['from_x'], walls['from_y'] = start[:, 0], start[:, 1]
+    walls['to_x'], walls['to_y'] = end[:, 0], end[:, 1]
+
+    # Index every wall by both of its endpoints, then join the desired junctions onto it
+    incidence = pd.concat([walls.assign(junction_id=walls['connected_from']),
+                           walls.assign(junction_id=walls['connected_to'])])
+    incidence = incidence.rename_axis('wall').reset_index()
+    incidence = incidence[incidence['junction_id'].notna()].drop_duplicates(['junction_id', 'wall'])
+    desired = junctions[junctions['junction_type'].isin(desired_junctions)]
+    desired = desired.assign(order=np.arange(len(desired)))
+    rows = desired.merge(incidence, on='junction_id', how='inner').sort_values(['order', 'wall'], kind='stable')
+    rows.insert(0, 'json_file', json_file)
+    junction_frame = rows[JUNCTION_COLUMNS].reset_index(drop=True)
+
+    known = ~(np.isnan(start).any(axis=1) | np.isnan(end).any(axis=1))
+    # The export does not always carry the image size; the columns are left empty then
+    size = annotation_size(data)
+    width, height = size if size is not None else (np.nan, np.nan)
+    segment_frame = pd.DataFrame({
+        'Index': np.arange(int(known.sum())),
+        'Start X': start[known, 0], 'Start Y': start[known, 1],
+        'End X': end[known, 0], 'End Y': end[known, 1],
+        'Image Width': width, 'Image Height': height,
+    }, columns=CSV_COLUMNS)
+    return junction_frame, segment_frame
+
+def output_paths(json_path, output_dir, segments_dir):
+    stem = os.path.splitext(os.path.basename(json_path))[0]
+    return os.path.join(output_dir, stem + '_junctions.csv'), os.path.join(segments_dir, stem + '.csv')
+
+def is_up_to_date(json_path, outputs):
+    # Both outputs exist and were written after the JSON last changed
+    source = os.path.getmtime(json_path)
+    return all(os.path.exists(path) and os.path.getmtime(path) >= source for path in outputs)
+
+def convert_file(json_path, output_dir, segments_dir, parser='auto'):
+    with open(json_path, 'rb') as f:
+        data = get_parser(parser)(f.read())
+    junction_frame, segment_frame = extract(data, os.path.basename(json_path))
+
+    # Written under a temporary name first, so a crash never leaves a complete-looking output
+    for frame, path in zip((junction_frame, segment_frame), output_paths(json_path, output_dir, segments_dir)):
+        frame.to_csv(path + '.tmp', index=False)
+        os.replace(path + '.tmp', path)
+    return len(junction_frame), len(segment_frame)
+
+def _convert(json_path, output_dir, segments_dir, parser):
+    # Runs in a worker process; failures are reported back instead of stopping the batch
+    try:
+        return json_path, convert_file(json_path, output_dir, segments_dir, parser), None
+    except Exception as error:
+        return json_path, None, f'{type(error).__name__}: {error}'
+
+def main():
+    parser = argparse.ArgumentParser(description='Convert annotation JSON files to junction and segment CSVs')
+    parser.add_argument('--json-dir', default=json_dir)
+    parser.add_argument('--output-dir', default=output_dir, help='where <name>_junctions.csv is written')
+    parser.add_argument('--segments-dir', default=segments_dir, help='where <name>.csv (Start/End X/Y) is written')
+    parser.add_argument('--workers', type=int, default=0, help='worker processes, 0 converts in this process')
+    parser.add_argument('--force', action='store_true', help='convert files whose outputs are already newer')
+    parser.add_argument('--parser', default='auto', choices=['auto'] + sorted(JSON_PARSERS),
+                        help='JSON parser, auto uses orjson when installed')
+    args = parser.parse_args()
+    get_parser(args.parser)
+
+    # Create the output directories if they don't exist
+    os.makedirs(args.output_dir, exist_ok=True)
+    os.makedirs(args.segments_dir, exist_ok=True)
+
+    files = [os.path.join(args.json_dir, name) for name in sorted(os.listdir(args.json_dir)) if name.endswith('.json')]
+    # Resumable: files converted by an earlier (possibly interrupted) run are skipped
+    jobs = [(path, args.output_dir, args.segments_dir, args.parser) for path in files
+            if args.force or not is_up_to_date(path, output_paths(path, args.output_dir, args.segments_dir))]
+    skipped = len(files) - len(jobs)
+
+    start = time.perf_counter()
+    failures = []
+
+    def report(done, result):
+        json_path, counts, error = result
+        name = os.path.basename(json_path)
+        if error is None:
+            print(f'[{done}/{len(jobs)}] {name}: {counts[0]} junction rows, {counts[1]} segments')
+        else:
+            failures.append((name, error))
+            print(f'[{done}/{len(jobs)}] {name}: failed, {error}')
+
+    if args.workers > 0 and jobs:
+        with concurrent.futures.ProcessPoolExecutor(max_workers=args.workers) as executor:
+            futures = [executor.submit(_convert, *job) for job in jobs]
+            for done, future in enumerate(concurrent.futures.as_completed(futures), 1):
+                report(done, future.result())
+    else:
+        for done, job in enumerate(jobs, 1):
+            report(done, _convert(*job))
+
+    elapsed = time.perf_counter() - start
+    rate = len(jobs) / elapsed if elapsed > 0 else float('inf')
+    print(f'Converted {len(jobs) - len(failures)} of {len(files)} files in {elapsed:.2f}s ({rate:.1f} files/sec), '
+          f'skipped {skipped} up to date, {len(failures)} failed')
+    for name, error in failures:
+        print(f'  {name}: {error}')
+    if failures:
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,65 @@
+# engine/adjacency.py
+import numpy as np
+from engine.profiler import profiler
+
+ADJACENCY_KEYS = ('deg', 'gcn_edge_index', 'gcn_weight', 'gcn_rowptr')
+
+@profiler.timed('adjacency')
+def adjacency_arrays(edges, num_nodes):
+    # Structure precomputed once per processed graph so layers don't rebuild it every forward:
+    #   deg             undirected degree (incident edge endpoints), as the 'degree' node feature
+    #   gcn_edge_index  edge_index with exactly one self loop per node, sorted by target then source
+    #   gcn_weight      entries of D^-1/2 (A + I) D^-1/2 for each gcn_edge_index column, D the
+    #                   in-degree of A + I. This is torch_geometric's gcn_norm, so
+    #                   GCNConv(normalize=False)(x, gcn_edge_index, gcn_weight) equals the default
+    #                   GCNConv on edge_index; the normalized Laplacian is I minus this matrix.
+    #   gcn_rowptr      CSR pointers by target: node i aggregates gcn_edge_index columns
+    #                   gcn_rowptr[i]:gcn_rowptr[i + 1]
+    edges = np.asarray(edges, dtype=np.int64).reshape(-1, 2)
+    deg = np.bincount(edges.reshape(-1), minlength=num_nodes).astype(np.int64)
+
+    # Existing self loops are replaced rather than doubled, as add_remaining_self_loops does
+    edges = edges[edges[:, 0] != edges[:, 1]]
+    loops = np.arange(num_nodes, dtype=np.int64)
+    source = np.concatenate([edges[:, 0], loops])
+    target = np.concatenate([edges[:, 1], loops])
+    order = np.lexsort((source, target))
+    source, target = source[order], target[order]
+
+    in_degree = np.bincount(target, minlength=num_nodes)
+    inv_sqrt = 1.0 / np.sqrt(in_degree)
+    rowptr = np.zeros(num_nodes + 1, dtype=np.int64)
+    np.cumsum(in_degree, out=rowptr[1:])
+    return {
+        'deg': deg,
+        'gcn_edge_index': np.stack([source, target]),
+        'gcn_weight': inv_sqrt[source] * inv_sqrt[target],
+        'gcn_rowptr': rowptr,
+    }
+
+def add_adjacency(data):
+    # Attach the cache to a Data object built from its current edge_index
+    import torch
+
+    arrays = adjacency_arrays(data.edge_index.cpu().numpy().T, data.num_nodes)
+    for key, value in arrays.items():
+        dtype = torch.float if value.dtype.kind == 'f' else torch.long
+        data[key] = torch.as_tensor(value, dtype=dtype, device=data.edge_index.device)
+    return data
+
+def batch_rowptr(batch):
+    # gcn_edge_index, gcn_weight and deg batch correctly with the default collate, but the
+    # per-graph gcn_rowptr vectors are only concatenated. Rebuild one CSR pointer vector
+    # for the whole batch: drop each graph's leading zero and offset by the preceding edges.
+    import torch
+
+    rowptr = batch.gcn_rowptr
+    if not hasattr(batch, 'ptr') or batch.ptr is None:
+        return rowptr
+    num_graphs = batch.num_graphs
+    shift = torch.arange(num_graphs, device=rowptr.device)
+    counts = rowptr[batch.ptr[1:] + shift]
+    offsets = torch.cumsum(counts, 0) - counts
+    keep = torch.ones(len(rowptr), dtype=torch.bool, device=rowptr.device)
+    keep[batch.ptr[:-1] + shift] = False
+    return torch.cat([rowptr.new_zeros(1), rowptr[keep] + offsets[batch.batch]])
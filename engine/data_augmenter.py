@@ -1,18 +1,78 @@
 # engine/data_augmenter.py
-from torchvision import transforms
+import math
+import functools
 import torch
 import numpy as np
+from torch_geometric.transforms import BaseTransform
 
-augmentations = transforms.Compose([
-    transforms.RandomHorizontalFlip(),
-    transforms.RandomVerticalFlip(),
-    transforms.RandomRotation(30)
-])
+@functools.lru_cache(maxsize=None)
+def legacy_augmentations():
+    # torchvision is only needed by the legacy per-feature path, import it on first use
+    from torchvision import transforms
+    return transforms.Compose([
+        transforms.RandomHorizontalFlip(),
+        transforms.RandomVerticalFlip(),
+        transforms.RandomRotation(30)
+    ])
 
 def augment_node_coordinates(node_features):
+    augmentations = legacy_augmentations()
     augmented_features = []
     for feature in node_features:
         feature_tensor = torch.tensor(feature).unsqueeze(0)
         augmented_feature = augmentations(feature_tensor)
         augmented_features.append(augmented_feature.squeeze(0).numpy())
     return np.array(augmented_features)
+
+class GraphAugmenter(BaseTransform):
+    # Random flip/rotation/scale/jitter of node coordinates as one matrix product per graph.
+    # Works on a single Data object or on a whole Batch, where every graph gets its own
+    # transform around its own centroid. Usable as PoseGraphDataset(transform=GraphAugmenter()).
+    def __init__(self, flip_x=0.5, flip_y=0.5, max_rotation=30.0, scale=(0.9, 1.1), jitter=0.0,
+                 coord_dims=(0, 1)):
+        self.flip_x = flip_x
+        self.flip_y = flip_y
+        self.max_rotation = max_rotation
+        self.scale = scale
+        self.jitter = jitter
+        self.coord_dims = list(coord_dims)
+
+    def forward(self, data):
+        x = data.x
+        batch = getattr(data, 'batch', None)
+        if batch is None:
+            batch = torch.zeros(x.size(0), dtype=torch.long, device=x.device)
+            num_graphs = 1
+        else:
+            num_graphs = data.num_graphs
+
+        coords = x[:, self.coord_dims]
+        counts = torch.bincount(batch, minlength=num_graphs).clamp(min=1).to(coords.dtype)
+        centroid = torch.zeros(num_graphs, 2, dtype=coords.dtype, device=x.device)
+        centroid = centroid.index_add(0, batch, coords) / counts.unsqueeze(1)
+
+        # Per-graph 2x2 matrix: rotation @ diag(scale * flip)
+        options = dict(dtype=coords.dtype, device=x.device)
+        theta = (torch.rand(num_graphs, **options) * 2 - 1) * math.radians(self.max_rotation)
+        scale = torch.empty(num_graphs, **options).uniform_(*self.scale)
+        sign_x = torch.where(torch.rand(num_graphs, **options) < self.flip_x, -1.0, 1.0).to(coords.dtype)
+        sign_y = torch.where(torch.rand(num_graphs, **options) < self.flip_y, -1.0, 1.0).to(coords.dtype)
+        cos, sin = torch.cos(theta) * scale, torch.sin(theta) * scale
+        matrix = torch.stack([
+            torch.stack([cos * sign_x, -sin * sign_y], dim=1),
+            torch.stack([sin * sign_x, cos * sign_y], dim=1),
+        ], dim=1)
+
+        center = centroid[batch]
+        coords = torch.bmm(matrix[batch], (coords - center).unsqueeze(2)).squeeze(2) + center
+        if self.jitter > 0:
+            coords = coords + torch.randn_like(coords) * self.jitter
+
+        x = x.clone()
+        x[:, self.coord_dims] = coords
+        data.x = x
+        return data
+
+    def __repr__(self):
+        return (f'{self.__class__.__name__}(flip_x={self.flip_x}, flip_y={self.flip_y}, '
+                f'max_rotation={self.max_rotation}, scale={self.scale}, jitter={self.jitter})')
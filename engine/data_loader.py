@@ -1,8 +1,54 @@
 # engine/data_loader.py
-import pandas as pd
+import numpy as np
 import glob
+import json
+from engine.profiler import profiler
 
-def load_data(file_pattern):
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+SEGMENT_COLUMNS = ['Start X', 'Start Y', 'End X', 'End Y']
+IMAGE_COLUMNS = ['Image Width', 'Image Height']
+
+# JSON parsers by name, each taking the raw bytes of a file; 'auto' picks orjson when installed
+JSON_PARSERS = {'json': json.loads}
+if orjson is not None:
+    JSON_PARSERS['orjson'] = orjson.loads
+
+def get_parser(name='auto'):
+    if name == 'auto':
+        name = 'orjson' if 'orjson' in JSON_PARSERS else 'json'
+    if name not in JSON_PARSERS:
+        raise ValueError(f'unknown or unavailable JSON parser {name!r}, expected one of {sorted(JSON_PARSERS)}')
+    return JSON_PARSERS[name]
+
+def list_files(file_pattern):
+    return sorted(glob.glob(file_pattern))
+
+@profiler.timed('load_data')
+def read_data(file, columns=SEGMENT_COLUMNS):
+    # Only parse the columns the graph needs, straight into float32
+    import pandas as pd
+    return pd.read_csv(file, usecols=columns, dtype={column: np.float32 for column in columns})
+
+@profiler.timed('load_data')
+def read_annotation(file, parser='auto'):
+    # Junction/wall annotation JSON, parsed with orjson when it is installed
+    with open(file, 'rb') as f:
+        return get_parser(parser)(f.read())
+
+def iter_data(file_pattern, columns=SEGMENT_COLUMNS):
+    for file in list_files(file_pattern):
+        yield file, read_data(file, columns)
+
+def load_data(file_pattern, lazy=False, columns=SEGMENT_COLUMNS):
+    # lazy=True returns a generator of (path, frame) instead of reading everything up front
+    if lazy:
+        return iter_data(file_pattern, columns)
+
+    import pandas as pd
     all_data = []
     for file in glob.glob(file_pattern):
         data = pd.read_csv(file)
@@ -1,7 +1,83 @@
 # engine/data_normalizer.py
-from sklearn.preprocessing import StandardScaler
+import json
+import sys
+import numpy as np
+from engine.profiler import profiler
 
+STATS_NAME = 'feature_stats.json'
+
+@profiler.timed('normalize_features')
 def normalize_features(features):
+    from sklearn.preprocessing import StandardScaler
     scaler = StandardScaler()
     normalized_features = scaler.fit_transform(features)
     return normalized_features
+
+class FeatureStats:
+    # Dataset-wide per-column mean/variance accumulated one file at a time.
+    # Partial results from different files or workers combine exactly with merge()
+    # (Chan et al. parallel form of Welford's update), so no two files are ever loaded together.
+    def __init__(self, count=0, mean=None, m2=None):
+        self.count = count
+        self.mean = None if mean is None else np.asarray(mean, dtype=np.float64)
+        self.m2 = None if m2 is None else np.asarray(m2, dtype=np.float64)
+
+    def update(self, features):
+        features = np.asarray(features, dtype=np.float64)
+        if len(features) == 0:
+            return self
+        mean = features.mean(axis=0)
+        m2 = ((features - mean) ** 2).sum(axis=0)
+        return self.merge(FeatureStats(len(features), mean, m2))
+
+    def merge(self, other):
+        if other.count == 0:
+            return self
+        if self.count == 0:
+            self.count, self.mean, self.m2 = other.count, other.mean.copy(), other.m2.copy()
+            return self
+        count = self.count + other.count
+        delta = other.mean - self.mean
+        self.mean = self.mean + delta * other.count / count
+        self.m2 = self.m2 + other.m2 + delta ** 2 * self.count * other.count / count
+        self.count = count
+        return self
+
+    @property
+    def variance(self):
+        return self.m2 / max(self.count, 1)
+
+    @property
+    def std(self):
+        # Constant columns are left unscaled, as StandardScaler does
+        std = np.sqrt(self.variance)
+        return np.where(std > 0, std, 1.0)
+
+    def transform(self, features):
+        # A tensor can only come from an already imported torch, so don't import it here
+        torch = sys.modules.get('torch')
+        if torch is not None and isinstance(features, torch.Tensor):
+            mean = torch.as_tensor(self.mean, dtype=features.dtype, device=features.device)
+            std = torch.as_tensor(self.std, dtype=features.dtype, device=features.device)
+            return (features - mean) / std
+        return (np.asarray(features) - self.mean) / self.std
+
+    def to_dict(self):
+        return {
+            'count': self.count,
+            'mean': None if self.mean is None else self.mean.tolist(),
+            'm2': None if self.m2 is None else self.m2.tolist(),
+        }
+
+    @classmethod
+    def from_dict(cls, values):
+        return cls(values['count'], values['mean'], values['m2'])
+
+    def save(self, path):
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.to_dict(), f, indent=2)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, 'r', encoding='utf-8') as f:
+            return cls.from_dict(json.load(f))
@@ -1,38 +1,390 @@
 # engine/dataset.py
 import os
-import torch
+import time
+import concurrent.futures
+import numpy as np
 from torch_geometric.data import InMemoryDataset
-from engine.data_loader import load_data
-from engine.graph_constructor import process_data, create_graph
-from engine.data_normalizer.py import normalize_features
+from torch_geometric.data.separate import separate
+from engine.data_loader import list_files, read_data, read_annotation, SEGMENT_COLUMNS, IMAGE_COLUMNS
+from engine.graph_constructor import segment_array, build_graph_arrays, snap_nodes, image_size, build_features, create_graph, \
+    simplify_collinear, annotation_arrays, annotation_size, WALL_FEATURES
+from engine.data_normalizer import STATS_NAME, normalize_features, FeatureStats
+from engine.manifest import fingerprint, load_manifest, save_manifest, discard_manifest
+from engine.subgraph import make_subgraphs
+from engine.adjacency import add_adjacency
+from engine.validator import VALIDATION_MODES, validate_segments, validate_edges
+from engine.profiler import profiler
+from engine.storage import X_DTYPES, pack_tensors, unpack_tensors, write, read, save_graph, load_graph
+
+# Raw file location under the dataset root for each raw_format
+RAW_FORMATS = {'csv': ('csv_data', '*.csv'), 'json': ('json_data', '*.json')}
+
+def build_graph(data, snap_epsilon=None, normalization='graph', node_features=('xy',), edge_features=(),
+                validation=None, simplify_tol=None, adjacency=False, raw_format='csv'):
+    # Returns the graph and a small report dict that ends up in the manifest.
+    # data is a CSV frame, or the parsed annotation JSON when raw_format='json'.
+    report = {}
+    node_types = wall_attr = None
+    if raw_format == 'json':
+        node_coords, node_types, edges, wall_attr, report['unknown_walls'] = annotation_arrays(data)
+        rows = len(edges) + report['unknown_walls']
+        size = annotation_size(data) if 'xy_norm' in node_features else None
+        if not any(name in WALL_FEATURES for name in edge_features):
+            wall_attr = None
+        elif simplify_tol is not None:
+            raise ValueError('simplify_tol cannot be combined with the annotated wall edge features')
+        if snap_epsilon is not None:
+            # Snapping keeps the first junction of each cluster, and with it that junction's type
+            merged_nodes, edges, report['merged'] = snap_nodes(np.column_stack([node_coords, node_types]), edges,
+                                                               snap_epsilon)
+            node_coords, node_types = merged_nodes[:, :2], merged_nodes[:, 2].astype(np.int64)
+    else:
+        rows = len(data)
+        segments = segment_array([data])
+        size = image_size(data) if 'xy_norm' in node_features or validation is not None else None
+        if validation is not None:
+            segments, report['validation'] = validate_segments(segments, size, validation)
+        node_coords, edges = build_graph_arrays(segments)
+        if snap_epsilon is not None:
+            node_coords, edges, report['merged'] = snap_nodes(node_coords, edges, snap_epsilon)
+    if validation is not None:
+        # Zero-length rows kept in 'report' mode are already counted; drop/repair removed them
+        reported_loops = report.get('validation', {}).get('zero_length', 0) if validation == 'report' else 0
+        edges, wall_attr, edge_report = validate_edges(edges, validation, wall_attr, reported_loops)
+        report.setdefault('validation', {}).update(edge_report)
+    orig_id = None
+    if simplify_tol is not None:
+        node_coords, edges, orig_id, report['simplify'] = simplify_collinear(node_coords, edges, simplify_tol)
+        if node_types is not None:
+            node_types = node_types[orig_id]
+    x, edge_attr = build_features(node_coords, edges, size, node_features, edge_features, node_types, wall_attr)
+    if normalization == 'graph':
+        x = normalize_features(x)
+    elif normalization == 'global':
+        # Stored raw; the dataset-wide statistics are applied when the graph is loaded
+        report['stats'] = FeatureStats().update(x).to_dict()
+    report['num_nodes'], report['num_edges'] = len(x), len(edges)
+    profiler.count('rows', rows)
+    profiler.count('nodes', len(x))
+    profiler.count('edges', len(edges))
+    graph_data = create_graph(x, edges, edge_attr)
+    if node_types is not None:
+        graph_data.junction_type = graph_data.edge_index.new_tensor(node_types)
+    if orig_id is not None:
+        graph_data.orig_id = graph_data.edge_index.new_tensor(orig_id)
+    if adjacency:
+        add_adjacency(graph_data)
+    return graph_data, report
+
+def graph_columns(params):
+    # Image Width/Image Height are only parsed when a feature or the validator needs them
+    if 'xy_norm' in params['node_features'] or params.get('validation') is not None:
+        return SEGMENT_COLUMNS + IMAGE_COLUMNS
+    return SEGMENT_COLUMNS
+
+@profiler.timed('save')
+def save_collated(data_list, path, x_dtype=None, compression=None):
+    # One contiguous tensor per attribute plus slice offsets, as InMemoryDataset.save writes it
+    # Without x_dtype or compression the tensors are written as they are, so they can be memory-mapped
+    data, slices = InMemoryDataset.collate(data_list)
+    if x_dtype is None and compression is None:
+        write((data.to_dict(), slices, data.__class__), path)
+        return
+    tensors, meta = pack_tensors(data.to_dict(), x_dtype)
+    write((tensors, slices, data.__class__, meta), path, compression)
+
+@profiler.timed('load_graph')
+def load_collated(path, mmap=False):
+    # mmap=True maps the tensor storages from disk instead of reading them into memory
+    data, slices, data_cls, *meta = read(path, mmap)
+    if meta:
+        data = unpack_tensors(data, meta[0])
+    return data_cls.from_dict(data), slices
+
+def split_collated(path):
+    data, slices = load_collated(path)
+    if slices is None:
+        return [data]
+    count = len(next(iter(slices.values()))) - 1
+    return [separate(cls=data.__class__, batch=data, idx=i, slice_dict=slices, decrement=False)
+            for i in range(count)]
+
+def read_raw(file, params):
+    if params.get('raw_format') == 'json':
+        return read_annotation(file)
+    return read_data(file, graph_columns(params))
+
+def _process_file(i, file, params, path, storage_options):
+    # Runs in a worker process: read one raw file and build its graph. With a path the
+    # graph is written straight to disk, otherwise it is sent back for collation.
+    graph_data, report = build_graph(read_raw(file, params), **params)
+    if path is None:
+        return i, report, graph_data
+    save_graph(graph_data, path, **storage_options)
+    return i, report, None
+
+def _profiled_process_file(*job):
+    # Pool variant: time the job in the worker and ship the measurements back
+    profiler.enable()
+    result = _process_file(*job)
+    profiler.disable()
+    return result + (profiler.snapshot(),)
 
 class PoseGraphDataset(InMemoryDataset):
-    def __init__(self, root, transform=None, pre_transform=None):
+    def __init__(self, root, transform=None, pre_transform=None, snap_epsilon=None, num_workers=0,
+                 storage='files', mmap=False, normalization='graph', node_features=('xy',), edge_features=(),
+                 x_dtype=None, compression=None, validation=None, simplify_tol=None, adjacency=False,
+                 raw_format='csv'):
+        # snap_epsilon (pixels) merges near-coincident endpoints; None keeps exact matching
+        self.snap_epsilon = snap_epsilon
+        # normalization='graph' standardizes every graph on its own, 'global' with
+        # statistics streamed over the whole corpus and applied at load time, 'none' not at all
+        if normalization not in ('graph', 'global', 'none'):
+            raise ValueError(f"normalization must be 'graph', 'global' or 'none', got {normalization!r}")
+        self.normalization = normalization
+        self.feature_stats = None
+        # validation: None, 'report', 'drop' or 'repair', see engine.validator
+        if validation not in VALIDATION_MODES:
+            raise ValueError(f'validation must be one of {VALIDATION_MODES}, got {validation!r}')
+        self.validation = validation
+        # simplify_tol (degrees) collapses straight runs of collinear wall segments,
+        # see engine.graph_constructor.simplify_collinear; None keeps every node
+        self.simplify_tol = simplify_tol
+        # Node/edge feature columns, see engine.graph_constructor.build_features
+        self.node_features = list(node_features)
+        self.edge_features = list(edge_features)
+        # adjacency=True stores degree, CSR pointers and GCN edge weights in every graph,
+        # see engine.adjacency; it is a graph parameter, so toggling it rebuilds the graphs,
+        # also when an already processed root is reopened
+        self.adjacency = adjacency
+        # num_workers > 0 shards process() across a process pool
+        self.num_workers = num_workers
+        # storage='files' keeps one data_i.pt per graph, 'collated' a single data.pt
+        # sliced by get(); mmap memory-maps the collated file
+        if storage not in ('files', 'collated'):
+            raise ValueError(f"storage must be 'files' or 'collated', got {storage!r}")
+        self.storage = storage
+        self.mmap = mmap
+        # Compact on-disk format: x_dtype 'float16'/'quant16' packs float tensors (int64
+        # indices become int32 whenever either option is set), compression 'zstd'/'lz4'
+        # compresses each file. Loading upcasts transparently; compressed files cannot be
+        # memory-mapped. With neither option files are written as plain torch.save archives.
+        if x_dtype not in X_DTYPES:
+            raise ValueError(f'x_dtype must be one of {X_DTYPES}, got {x_dtype!r}')
+        if mmap and compression is not None:
+            raise ValueError('mmap cannot be combined with compression')
+        self.storage_options = {'x_dtype': x_dtype, 'compression': compression}
+        # raw_format='csv' reads root/csv_data/*.csv, 'json' the junction/wall annotations
+        # in root/json_data/*.json directly. Only the file list is needed up front; files
+        # are read when a graph is (re)built.
+        if raw_format not in RAW_FORMATS:
+            raise ValueError(f'raw_format must be one of {tuple(RAW_FORMATS)}, got {raw_format!r}')
+        self.raw_format = raw_format
+        self.raw_files = list_files(os.path.join(root, *RAW_FORMATS[raw_format]))
         super(PoseGraphDataset, self).__init__(root, transform, pre_transform)
-        self.data_list = load_data(os.path.join(root, 'csv_data', '*.csv'))
-    
+        if self._outdated():
+            # PyG only checks that the output files exist; rebuild whatever the manifest
+            # says no longer matches the raw files or the requested parameters
+            self.process()
+            return
+        if self.storage == 'collated':
+            self._load_collated()
+        if self.normalization == 'global':
+            path = os.path.join(self.processed_dir, STATS_NAME)
+            if os.path.exists(path):
+                self.feature_stats = FeatureStats.load(path)
+            else:
+                # Outputs from a per-graph run exist but were never summarized
+                self.process()
+
+    @property
+    def raw_dir(self):
+        return os.path.join(self.root, RAW_FORMATS[self.raw_format][0])
+
     @property
     def raw_file_names(self):
-        return [os.path.basename(file) for file in self.data_list]
-    
+        return [os.path.basename(file) for file in self.raw_files]
+
     @property
     def processed_file_names(self):
-        return [f'data_{i}.pt' for i in range(len(self.data_list))]
-    
+        if self.storage == 'collated':
+            return ['data.pt']
+        return [f'data_{i}.pt' for i in range(len(self.raw_files))]
+
     def download(self):
         pass
-    
-    def process(self):
-        for i, data in enumerate(self.data_list):
-            nodes, edges, node_features = process_data([data])
-            node_features = normalize_features(node_features)
-            graph_data = create_graph(node_features, edges)
-            
-            torch.save(graph_data, os.path.join(self.processed_dir, f'data_{i}.pt'))
-    
+
+    def graph_params(self):
+        # Everything that changes the content of a processed graph; recorded in the manifest
+        return {
+            'snap_epsilon': self.snap_epsilon,
+            'normalization': self.normalization,
+            'node_features': self.node_features,
+            'edge_features': self.edge_features,
+            'validation': self.validation,
+            'simplify_tol': self.simplify_tol,
+            'adjacency': self.adjacency,
+            'raw_format': self.raw_format,
+        }
+
+    def process(self, force=False):
+        start = time.perf_counter()
+        total = len(self.raw_files)
+        collated = self.storage == 'collated'
+        params = self.graph_params()
+
+        # Compare against the manifest of the previous run: a graph is reused when its
+        # CSV content and the processing parameters are unchanged
+        manifest = load_manifest(self.processed_dir)
+        reusable = {}
+        if manifest and not force and manifest.get('params') == params and manifest.get('storage') == self.storage \
+                and manifest.get('storage_options') == self.storage_options:
+            reusable = {entry['file']: (j, entry) for j, entry in enumerate(manifest['graphs'])}
+
+        entries = []
+        reuse = {}
+        for i, file in enumerate(self.raw_files):
+            j, previous = reusable.get(os.path.basename(file), (None, None))
+            entry = fingerprint(file, previous)
+            entries.append(entry)
+            if previous is not None and previous['sha1'] == entry['sha1']:
+                reuse[i] = j
+                entry['report'] = previous.get('report', {})
+
+        discard_manifest(self.processed_dir)
+        graphs = [None] * total
+        unchanged = False
+        if collated:
+            path = os.path.join(self.processed_dir, 'data.pt')
+            if reuse and os.path.exists(path):
+                old_graphs = split_collated(path)
+                for i, j in reuse.items():
+                    graphs[i] = old_graphs[j]
+                unchanged = len(old_graphs) == total and all(i == j for i, j in reuse.items())
+            else:
+                reuse = {}
+        else:
+            reuse = self._move_reused(reuse)
+
+        jobs = [(i, file, params, None if collated else os.path.join(self.processed_dir, f'data_{i}.pt'),
+                 self.storage_options)
+                for i, file in enumerate(self.raw_files) if i not in reuse]
+
+        if self.num_workers > 0 and jobs:
+            task = _profiled_process_file if profiler.enabled else _process_file
+            with concurrent.futures.ProcessPoolExecutor(max_workers=self.num_workers) as executor:
+                futures = [executor.submit(task, *job) for job in jobs]
+                for done, future in enumerate(concurrent.futures.as_completed(futures), 1):
+                    i, entries[i]['report'], graphs[i], *snapshot = future.result()
+                    if snapshot:
+                        profiler.merge(snapshot[0])
+                    self._report(done, len(jobs), i, entries[i]['report'])
+        else:
+            for done, job in enumerate(jobs, 1):
+                i, entries[i]['report'], graphs[i] = _process_file(*job)
+                self._report(done, len(jobs), i, entries[i]['report'])
+
+        if collated:
+            if jobs or not unchanged:
+                save_collated(graphs, path, **self.storage_options)
+            self._load_collated()
+        if self.normalization == 'global':
+            # Per-file partial statistics live in the manifest, so reused graphs still count
+            self.feature_stats = FeatureStats()
+            for entry in entries:
+                self.feature_stats.merge(FeatureStats.from_dict(entry['report']['stats']))
+            self.feature_stats.save(os.path.join(self.processed_dir, STATS_NAME))
+        removed = self._remove_stale(total)
+        save_manifest(self.processed_dir, {'storage': self.storage, 'storage_options': self.storage_options,
+                                           'params': params, 'graphs': entries})
+
+        elapsed = time.perf_counter() - start
+        rate = len(jobs) / elapsed if elapsed > 0 else float('inf')
+        print(f'Rebuilt {len(jobs)} of {total} graphs in {elapsed:.2f}s ({rate:.1f} graphs/sec), '
+              f'reused {len(reuse)}, removed {removed} stale')
+
+    def _outdated(self):
+        # Unchanged files are recognized by size and mtime, so this costs one stat() per file
+        manifest = load_manifest(self.processed_dir)
+        if manifest is None or manifest.get('params') != self.graph_params() \
+                or manifest.get('storage') != self.storage or manifest.get('storage_options') != self.storage_options:
+            return True
+        entries = manifest['graphs']
+        if [entry['file'] for entry in entries] != self.raw_file_names:
+            return True
+        return any(fingerprint(file, entry)['sha1'] != entry['sha1'] for file, entry in zip(self.raw_files, entries))
+
+    def graph_sizes(self):
+        # Node counts recorded at process() time, without loading any graph. Follows
+        # self.indices(), so subsets (dataset[train_idx]) and shuffled copies line up.
+        entries = load_manifest(self.processed_dir)['graphs']
+        sizes = []
+        for j in self.indices():
+            report = entries[j].get('report', {})
+            sizes.append(report['num_nodes'] if 'num_nodes' in report else self.get(j).num_nodes)
+        return sizes
+
+    def subgraphs(self, idx, max_nodes, num_hops=1):
+        # Bounded-size pieces of one graph, see engine.subgraph.make_subgraphs
+        return make_subgraphs(self[idx], max_nodes, num_hops)
+
+    def _move_reused(self, reuse):
+        # CSVs added or removed shift indices; rename kept outputs to their new index
+        # in two phases so that no file is overwritten before it has been moved
+        kept = {}
+        for i, j in reuse.items():
+            old = os.path.join(self.processed_dir, f'data_{j}.pt')
+            if os.path.exists(old):
+                os.replace(old, os.path.join(self.processed_dir, f'data_{i}.pt.reuse'))
+                kept[i] = j
+        for i in kept:
+            os.replace(os.path.join(self.processed_dir, f'data_{i}.pt.reuse'),
+                       os.path.join(self.processed_dir, f'data_{i}.pt'))
+        return kept
+
+    def _remove_stale(self, total):
+        # Also drops data_i.pt.reuse files left behind by a run that died between the two
+        # rename phases of _move_reused; without a manifest they can never be reused
+        removed = 0
+        for name in os.listdir(self.processed_dir):
+            index = name[len('data_'):-len('.pt')]
+            stale = self.storage == 'files' and name.startswith('data_') and name.endswith('.pt') \
+                and index.isdigit() and int(index) >= total
+            if stale or (name.startswith('data_') and name.endswith('.pt.reuse')):
+                os.remove(os.path.join(self.processed_dir, name))
+                removed += 1
+        return removed
+
+    def _load_collated(self):
+        self._data, self.slices = load_collated(os.path.join(self.processed_dir, 'data.pt'), self.mmap)
+        self._data_list = None
+
+    def _report(self, done, total, i, report):
+        message = f'[{done}/{total}] graph {i}'
+        if 'merged' in report:
+            message += f': merged {report["merged"]} nodes within {self.snap_epsilon}px'
+        issues = {key: value for key, value in report.get('validation', {}).items() if key != 'rows' and value}
+        if issues:
+            message += ' | ' + ', '.join(f'{key} {value}' for key, value in issues.items())
+        if report.get('unknown_walls'):
+            message += f" | {report['unknown_walls']} walls with unknown junctions"
+        if 'simplify' in report:
+            simplify = report['simplify']
+            message += f" | simplified {simplify['nodes']} -> {simplify['nodes'] - simplify['removed_nodes']} nodes " \
+                       f"({simplify['removed_nodes'] / max(simplify['nodes'], 1):.0%} fewer)"
+        print(message)
+
     def len(self):
+        if self.storage == 'collated':
+            return super(PoseGraphDataset, self).len()
         return len(self.processed_file_names)
-    
+
+    @profiler.timed('get')
     def get(self, idx):
-        data = torch.load(os.path.join(self.processed_dir, f'data_{idx}.pt'))
+        if self.storage == 'collated':
+            data = super(PoseGraphDataset, self).get(idx)
+        else:
+            data = load_graph(os.path.join(self.processed_dir, f'data_{idx}.pt'))
+        if self.feature_stats is not None:
+            data.x = self.feature_stats.transform(data.x)
         return data
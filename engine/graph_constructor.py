@@ -1,9 +1,219 @@
 # engine/graph_constructor.py
 import numpy as np
-import torch
-from torch_geometric.data import Data
+from engine.data_loader import SEGMENT_COLUMNS, IMAGE_COLUMNS
+from engine.profiler import profiler
+
+NODE_FEATURES = ('xy', 'xy_norm', 'degree', 'type')
+EDGE_FEATURES = ('length', 'angle', 'wall_length', 'euclidean_distance')
+# Junction categories of the annotation JSON; anything else falls into the last, 'other'
+JUNCTION_TYPES = ('junc_I_open', 'junc_I_normal', 'junc_I_isolation', 'junc_I', 'junc_L', 'junc_T', 'junc_X',
+                  'other')
+WALL_FEATURES = ('wall_length', 'euclidean_distance')
+
+def segment_array(data_list):
+    # Stack the Start X/Start Y/End X/End Y block of every frame into one (N, 4) array
+    blocks = [data[SEGMENT_COLUMNS].to_numpy(dtype=np.float64) for data in data_list]
+    if not blocks:
+        return np.empty((0, 4), dtype=np.float64)
+    return np.concatenate(blocks)
+
+@profiler.timed('process_data')
+def build_graph_arrays(segments):
+    # Endpoints in row order: start_0, end_0, start_1, end_1, ...
+    points = np.asarray(segments).reshape(-1, 2)
+    if len(points) == 0:
+        return np.empty((0, 2), dtype=points.dtype), np.empty((0, 2), dtype=np.int64)
+
+    unique_points, first_seen, inverse = np.unique(points, axis=0, return_index=True, return_inverse=True)
+    inverse = inverse.reshape(-1)
+
+    # np.unique sorts lexicographically; renumber nodes in order of first appearance
+    order = np.argsort(first_seen, kind='stable')
+    rank = np.empty_like(order)
+    rank[order] = np.arange(len(order))
+
+    node_features = unique_points[order]
+    edges = rank[inverse].reshape(-1, 2).astype(np.int64)
+    return node_features, edges
+
+def connected_components(num_nodes, pairs_i, pairs_j):
+    # Min-label propagation with pointer jumping: every node ends up labelled with
+    # the smallest node id of its component
+    labels = np.arange(num_nodes)
+    while True:
+        previous = labels.copy()
+        lowest = np.minimum(labels[pairs_i], labels[pairs_j])
+        np.minimum.at(labels, pairs_i, lowest)
+        np.minimum.at(labels, pairs_j, lowest)
+        labels = labels[labels]
+        if np.array_equal(labels, previous):
+            return labels
+
+@profiler.timed('snap_nodes')
+def snap_nodes(node_features, edges, epsilon):
+    # Merge nodes closer than epsilon (in pixels) using a uniform grid hash.
+    # Any pair within epsilon lies in the same or an adjacent cell, so only
+    # half of the 3x3 neighbourhood needs to be compared for each cell.
+    node_features = np.asarray(node_features)
+    num_nodes = len(node_features)
+    if num_nodes < 2 or epsilon <= 0:
+        return node_features, edges, 0
+
+    points = node_features[:, :2].astype(np.float64)
+    cells = np.floor(points / epsilon).astype(np.int64)
+    cells -= cells.min(axis=0)
+    cells[:, 1] += 1
+    span = int(cells[:, 1].max()) + 2
+    if (int(cells[:, 0].max()) + 2) * span >= 2 ** 62:
+        raise ValueError(f'snap epsilon {epsilon} is too small for the coordinate range')
+    keys = cells[:, 0] * span + cells[:, 1]
+
+    order = np.argsort(keys, kind='stable')
+    cell_keys, starts, counts = np.unique(keys[order], return_index=True, return_counts=True)
+
+    pairs_i = []
+    pairs_j = []
+    for dx, dy in ((0, 0), (1, -1), (1, 0), (1, 1), (0, 1)):
+        target = cell_keys + dx * span + dy
+        pos = np.minimum(np.searchsorted(cell_keys, target), len(cell_keys) - 1)
+        cell_a = np.flatnonzero(cell_keys[pos] == target)
+        cell_b = pos[cell_a]
+
+        # Expand every matched cell pair into all point pairs between them
+        count_a = counts[cell_a]
+        count_b = counts[cell_b]
+        sizes = count_a * count_b
+        pair = np.repeat(np.arange(len(cell_a)), sizes)
+        local = np.arange(sizes.sum()) - np.repeat(np.cumsum(sizes) - sizes, sizes)
+        offset_a = local // count_b[pair]
+        offset_b = local % count_b[pair]
+        if dx == 0 and dy == 0:
+            keep = offset_a < offset_b
+            pair, offset_a, offset_b = pair[keep], offset_a[keep], offset_b[keep]
+        pairs_i.append(order[starts[cell_a][pair] + offset_a])
+        pairs_j.append(order[starts[cell_b][pair] + offset_b])
+
+    pairs_i = np.concatenate(pairs_i)
+    pairs_j = np.concatenate(pairs_j)
+    close = np.sum((points[pairs_i] - points[pairs_j]) ** 2, axis=1) <= epsilon ** 2
+    pairs_i = pairs_i[close]
+    pairs_j = pairs_j[close]
+
+    # The surviving label is the first-seen node of each cluster
+    labels = connected_components(num_nodes, pairs_i, pairs_j)
+    keep = labels == np.arange(num_nodes)
+    mapping = (np.cumsum(keep) - 1)[labels]
+    merged = num_nodes - int(keep.sum())
+    return node_features[keep], mapping[edges], merged
+
+@profiler.timed('simplify')
+def simplify_collinear(node_coords, edges, tolerance):
+    # Collapse straight runs of wall: a node is removed when it has exactly two incident
+    # edges (self loops excluded) and they continue each other within `tolerance` degrees.
+    # Each chain of removed nodes becomes one edge between the kept nodes at its ends,
+    # placed where the chain's first edge was and oriented along it. orig_id maps the
+    # kept nodes back to their ids before simplification.
+    node_coords = np.asarray(node_coords)
+    edges = np.asarray(edges, dtype=np.int64).reshape(-1, 2)
+    num_nodes = len(node_coords)
+    report = {'nodes': num_nodes, 'edges': len(edges)}
+    removable = np.zeros(num_nodes, dtype=bool)
+
+    loop = edges[:, 0] == edges[:, 1]
+    edge_ids = np.flatnonzero(~loop)
+    node = edges[edge_ids].reshape(-1)
+    other = edges[edge_ids][:, ::-1].reshape(-1)
+    order = np.argsort(node, kind='stable')
+    node, other = node[order], other[order]
+    degree = np.bincount(node, minlength=num_nodes)
+    degree[edges[loop, 0]] = 0
+
+    # Both neighbours of a degree-2 node sit next to each other in the sorted incidence list
+    candidate = np.flatnonzero(degree == 2)
+    first = np.searchsorted(node, candidate)
+    a, b = other[first], other[first + 1]
+    points = node_coords[:, :2].astype(np.float64)
+    to_a = points[a] - points[candidate]
+    to_b = points[b] - points[candidate]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        cos = np.sum(to_a * to_b, axis=1) / (np.hypot(*to_a.T) * np.hypot(*to_b.T))
+    removable[candidate[(a != b) & (cos <= -np.cos(np.radians(tolerance)))]] = True
+
+    # Chains are the connected components of removable nodes; a chain with a kept node at
+    # each end has exactly two boundary edges. Closed loops of removable nodes and chains
+    # that start and end at the same kept node are left untouched.
+    start_removed, end_removed = removable[edges[:, 0]], removable[edges[:, 1]]
+    inner = np.flatnonzero(start_removed & end_removed)
+    labels = connected_components(num_nodes, edges[inner, 0], edges[inner, 1])
+    boundary = np.flatnonzero(start_removed ^ end_removed)
+    outward = end_removed[boundary]
+    chain = labels[np.where(outward, edges[boundary, 1], edges[boundary, 0])]
+    kept_end = np.where(outward, edges[boundary, 0], edges[boundary, 1])
+    order = np.lexsort((boundary, chain))
+    boundary, outward, chain, kept_end = boundary[order], outward[order], chain[order], kept_end[order]
+
+    ends = np.bincount(chain, minlength=num_nodes)
+    first_of_chain = np.ones(len(chain), dtype=bool)
+    first_of_chain[1:] = chain[1:] != chain[:-1]
+    head = np.flatnonzero((ends[chain] == 2) & first_of_chain)
+    valid = kept_end[head] != kept_end[head + 1]
+    collapsed = np.zeros(num_nodes, dtype=bool)
+    collapsed[chain[head[valid]]] = True
+    removable &= collapsed[labels]
+    head = head[valid]
+
+    # Untouched edges keep their order, each chain's new edge takes its first edge's slot
+    keep_edge = ~(removable[edges[:, 0]] | removable[edges[:, 1]])
+    new_edges = np.where(outward[head, None],
+                         np.stack([kept_end[head], kept_end[head + 1]], axis=1),
+                         np.stack([kept_end[head + 1], kept_end[head]], axis=1))
+    slots = np.concatenate([np.flatnonzero(keep_edge), boundary[head]])
+    edges = np.concatenate([edges[keep_edge], new_edges.reshape(-1, 2)])[np.argsort(slots, kind='stable')]
+
+    keep = ~removable
+    mapping = np.cumsum(keep) - 1
+    report['removed_nodes'] = int(removable.sum())
+    report['removed_edges'] = report['edges'] - len(edges)
+    return node_coords[keep], mapping[edges], np.flatnonzero(keep), report
+
+@profiler.timed('process_data')
+def annotation_arrays(data):
+    # Graph straight from a junction/wall annotation: one node per junction, one edge per
+    # wall, in file order. Returns coordinates, junction type codes (see JUNCTION_TYPES),
+    # edges, the walls' (length, euclidean_distance) and the number of walls dropped
+    # because an endpoint id is not among the junctions.
+    annotation = data['annotations'][0]
+    junctions = annotation['junctions']
+    walls = annotation['walls']
+    codes = {name: code for code, name in enumerate(JUNCTION_TYPES)}
+    node_coords = np.array([(junction['position']['x'], junction['position']['y']) for junction in junctions],
+                           dtype=np.float64).reshape(-1, 2)
+    node_types = np.array([codes.get(junction['type'], len(JUNCTION_TYPES) - 1) for junction in junctions],
+                          dtype=np.int64)
+
+    index = {junction['id']: i for i, junction in enumerate(junctions)}
+    edges = np.array([(index.get(wall['start'], -1), index.get(wall['end'], -1)) for wall in walls],
+                     dtype=np.int64).reshape(-1, 2)
+    wall_attr = np.array([(wall['length'], wall['euclidean_distance']) for wall in walls],
+                         dtype=np.float64).reshape(-1, 2)
+    known = (edges >= 0).all(axis=1)
+    return node_coords, node_types, edges[known], wall_attr[known], int((~known).sum())
+
+def annotation_size(data):
+    # Image Width/Image Height of an annotation when the export carries them, else None
+    annotation = data['annotations'][0]
+    for source in (annotation, data, data.get('image', {})):
+        if 'width' in source and 'height' in source:
+            return np.array([source['width'], source['height']], dtype=np.float64)
+    return None
 
 def process_data(data_list):
+    node_features, edges = build_graph_arrays(segment_array(data_list))
+    nodes = [tuple(node) for node in node_features.tolist()]
+    return nodes, edges, node_features
+
+def process_data_iterrows(data_list):
+    # Original row-by-row implementation, kept as the reference for benchmarks
     nodes = []
     edges = []
     node_features = []
@@ -12,26 +222,83 @@ def process_data(data_list):
         for index, row in data.iterrows():
             start_node = (row['Start X'], row['Start Y'])
             end_node = (row['End X'], row['End Y'])
-            
+
             if start_node not in nodes:
                 nodes.append(start_node)
                 node_features.append([row['Start X'], row['Start Y']])
-            
+
             if end_node not in nodes:
                 nodes.append(end_node)
                 node_features.append([row['End X'], row['End Y']])
-            
+
             edges.append((nodes.index(start_node), nodes.index(end_node)))
-    
+
     node_features = np.array(node_features)
     edges = np.array(edges)
-    
+
     return nodes, edges, node_features
 
-def create_graph(node_features, edges):
+def image_size(data):
+    # Every row of a plan carries the same Image Width/Image Height
+    return data[IMAGE_COLUMNS].to_numpy(dtype=np.float64)[0]
+
+@profiler.timed('build_features')
+def build_features(node_coords, edges, size=None, node_features=('xy',), edge_features=(), node_types=None,
+                   wall_attr=None):
+    # Node columns in the requested order:
+    #   xy      raw pixel coordinates
+    #   xy_norm coordinates divided by (Image Width, Image Height)
+    #   degree  number of incident edge endpoints
+    #   type    one-hot junction type over JUNCTION_TYPES (annotation JSON only)
+    # Edge columns: length (pixels) and angle (radians, atan2 of the segment direction);
+    # wall_length and euclidean_distance as annotated (annotation JSON only)
+    node_coords = np.asarray(node_coords, dtype=np.float64)
+    edges = np.asarray(edges).reshape(-1, 2)
+    columns = []
+    for name in node_features:
+        if name == 'xy':
+            columns.append(node_coords)
+        elif name == 'xy_norm':
+            if size is None or not np.isfinite(size).all():
+                raise ValueError("'xy_norm' needs the Image Width/Image Height columns")
+            columns.append(node_coords / size)
+        elif name == 'degree':
+            columns.append(np.bincount(edges.reshape(-1), minlength=len(node_coords))[:, None].astype(np.float64))
+        elif name == 'type':
+            if node_types is None:
+                raise ValueError("'type' is only available for annotation JSON input")
+            columns.append(np.eye(len(JUNCTION_TYPES))[node_types])
+        else:
+            raise ValueError(f'unknown node feature {name!r}, expected one of {NODE_FEATURES}')
+    x = np.hstack(columns) if columns else np.empty((len(node_coords), 0))
+
+    if not edge_features:
+        return x, None
+    delta = node_coords[edges[:, 1]] - node_coords[edges[:, 0]]
+    columns = []
+    for name in edge_features:
+        if name == 'length':
+            columns.append(np.hypot(delta[:, 0], delta[:, 1]))
+        elif name == 'angle':
+            columns.append(np.arctan2(delta[:, 1], delta[:, 0]))
+        elif name in WALL_FEATURES:
+            if wall_attr is None:
+                raise ValueError(f'{name!r} is only available for annotation JSON input')
+            columns.append(wall_attr[:, WALL_FEATURES.index(name)])
+        else:
+            raise ValueError(f'unknown edge feature {name!r}, expected one of {EDGE_FEATURES}')
+    return x, np.stack(columns, axis=1)
+
+@profiler.timed('create_graph')
+def create_graph(node_features, edges, edge_attr=None):
+    import torch
+    from torch_geometric.data import Data
+
     node_features = torch.tensor(node_features, dtype=torch.float)
     edge_index = torch.tensor(edges.T, dtype=torch.long)
-    
+
     data = Data(x=node_features, edge_index=edge_index)
-    
+    if edge_attr is not None:
+        data.edge_attr = torch.tensor(edge_attr, dtype=torch.float)
+
     return data
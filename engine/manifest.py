@@ -0,0 +1,44 @@
+# engine/manifest.py
+import os
+import json
+import hashlib
+
+MANIFEST_NAME = 'manifest.json'
+
+def file_hash(path, chunk_size=1 << 20):
+    digest = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def fingerprint(path, previous=None):
+    # Reuse the previous hash when size and mtime are unchanged, so an
+    # untouched corpus is checked with stat() calls only
+    stat = os.stat(path)
+    entry = {'file': os.path.basename(path), 'size': stat.st_size, 'mtime': stat.st_mtime_ns}
+    if previous and previous.get('size') == entry['size'] and previous.get('mtime') == entry['mtime']:
+        entry['sha1'] = previous['sha1']
+    else:
+        entry['sha1'] = file_hash(path)
+    return entry
+
+def load_manifest(processed_dir):
+    path = os.path.join(processed_dir, MANIFEST_NAME)
+    if not os.path.exists(path):
+        return None
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def discard_manifest(processed_dir):
+    # Called before outputs are moved or rewritten: a run that fails part-way then leaves
+    # no manifest pointing at renamed files, and the next run rebuilds everything
+    path = os.path.join(processed_dir, MANIFEST_NAME)
+    if os.path.exists(path):
+        os.remove(path)
+
+def save_manifest(processed_dir, manifest):
+    path = os.path.join(processed_dir, MANIFEST_NAME)
+    with open(path + '.tmp', 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(path + '.tmp', path)
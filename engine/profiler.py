@@ -0,0 +1,145 @@
+# engine/profiler.py
+import io
+import json
+import time
+import cProfile
+import pstats
+import functools
+import tracemalloc
+from contextlib import nullcontext
+
+_DISABLED = nullcontext()
+
+class _Timer:
+    __slots__ = ('profiler', 'name', 'start')
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.profiler.add_time(self.name, time.perf_counter() - self.start)
+        return False
+
+class Profiler:
+    # Stage timers and counters for the engine pipeline. Disabled by default: timer()
+    # then returns a shared no-op context and timed() functions make a single flag check.
+    def __init__(self):
+        self.enabled = False
+        self.reset()
+
+    def reset(self):
+        self.timings = {}
+        self.counters = {}
+        self.started = time.perf_counter()
+        self._cprofile = None
+        self._memory = False
+        self._stop_tracing = False
+        self.memory = None
+
+    def enable(self, cprofile=False, memory=False):
+        self.reset()
+        self.enabled = True
+        if cprofile:
+            self._cprofile = cProfile.Profile()
+            self._cprofile.enable()
+        if memory:
+            # Stopped again in disable(), unless tracing was already on before
+            self._memory = True
+            self._stop_tracing = not tracemalloc.is_tracing()
+            tracemalloc.start()
+
+    def disable(self):
+        self.enabled = False
+        if self._cprofile is not None:
+            self._cprofile.disable()
+        if self._memory:
+            # Tracing slows every allocation; keep the numbers and turn it off
+            current, peak = tracemalloc.get_traced_memory()
+            self.memory = {'current_bytes': current, 'peak_bytes': peak}
+            if self._stop_tracing:
+                tracemalloc.stop()
+            self._memory = self._stop_tracing = False
+
+    def timer(self, name):
+        if not self.enabled:
+            return _DISABLED
+        return _Timer(self, name)
+
+    def timed(self, name):
+        def decorator(fn):
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return fn(*args, **kwargs)
+                with _Timer(self, name):
+                    return fn(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def add_time(self, name, seconds):
+        entry = self.timings.setdefault(name, [0, 0.0, 0.0])
+        entry[0] += 1
+        entry[1] += seconds
+        entry[2] = max(entry[2], seconds)
+
+    def count(self, name, value=1):
+        if self.enabled:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def snapshot(self):
+        return {
+            'timings': {name: {'calls': c, 'total': t, 'max': m} for name, (c, t, m) in self.timings.items()},
+            'counters': dict(self.counters),
+        }
+
+    def merge(self, snapshot):
+        # Fold in a snapshot taken in a worker process
+        for name, entry in snapshot['timings'].items():
+            own = self.timings.setdefault(name, [0, 0.0, 0.0])
+            own[0] += entry['calls']
+            own[1] += entry['total']
+            own[2] = max(own[2], entry['max'])
+        for name, value in snapshot['counters'].items():
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def results(self):
+        results = self.snapshot()
+        results['wall_time'] = time.perf_counter() - self.started
+        if self._memory:
+            current, peak = tracemalloc.get_traced_memory()
+            results['memory'] = {'current_bytes': current, 'peak_bytes': peak}
+        elif self.memory is not None:
+            results['memory'] = dict(self.memory)
+        if self._cprofile is not None:
+            stream = io.StringIO()
+            pstats.Stats(self._cprofile, stream=stream).sort_stats('cumulative').print_stats(25)
+            results['cprofile'] = stream.getvalue()
+        return results
+
+    def dump(self, path):
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.results(), f, indent=2)
+
+    def summary(self):
+        results = self.results()
+        wall = results['wall_time']
+        lines = [f'Wall time {wall:.3f}s (stage times in worker processes add up across workers)',
+                 f"{'stage':<22} {'calls':>8} {'total s':>10} {'share':>7} {'max ms':>9}"]
+        for name, entry in sorted(results['timings'].items(), key=lambda item: -item[1]['total']):
+            share = entry['total'] / wall if wall > 0 else 0.0
+            lines.append(f"{name:<22} {entry['calls']:>8} {entry['total']:>10.3f} {share:>7.1%} "
+                         f"{entry['max'] * 1000:>9.2f}")
+        for name, value in sorted(results['counters'].items()):
+            lines.append(f'{name:<22} {value:>8}')
+        if 'memory' in results:
+            lines.append(f"peak traced memory {results['memory']['peak_bytes'] / 1e6:.1f} MB")
+        if 'cprofile' in results:
+            lines.append(results['cprofile'])
+        return '\n'.join(lines)
+
+profiler = Profiler()
@@ -0,0 +1,66 @@
+# engine/sampler.py
+import numpy as np
+from torch.utils.data import Sampler
+
+class NodeBudgetBatchSampler(Sampler):
+    # Packs graphs into batches whose total node count stays within max_nodes instead of
+    # using a fixed number of graphs per batch. Graphs are shuffled, then sorted by size
+    # inside windows of pool_size graphs, so each batch holds graphs of similar size while
+    # the epoch order stays random. A graph larger than the budget gets a batch of its own.
+    def __init__(self, sizes, max_nodes, shuffle=True, pool_size=1000, seed=0):
+        self.sizes = np.asarray(sizes, dtype=np.int64)
+        self.max_nodes = max_nodes
+        self.shuffle = shuffle
+        self.pool_size = pool_size
+        self.rng = np.random.default_rng(seed)
+        self.batches = None
+        self.stats = {}
+
+    def _build(self):
+        order = self.rng.permutation(len(self.sizes)) if self.shuffle else np.arange(len(self.sizes))
+        batches = []
+        for start in range(0, len(order), self.pool_size):
+            window = order[start:start + self.pool_size]
+            window = window[np.argsort(-self.sizes[window], kind='stable')]
+            batch, used = [], 0
+            for idx in window.tolist():
+                size = int(self.sizes[idx])
+                if batch and used + size > self.max_nodes:
+                    batches.append(batch)
+                    batch, used = [], 0
+                batch.append(idx)
+                used += size
+            if batch:
+                batches.append(batch)
+        if self.shuffle:
+            batches = [batches[i] for i in self.rng.permutation(len(batches))]
+        self.batches = batches
+        return batches
+
+    def batch_stats(self, batches):
+        # waste: unused share of the node budget over all steps
+        # padding: share of padded slots if every graph were padded to the largest in its batch
+        nodes = np.array([self.sizes[b].sum() for b in batches], dtype=np.float64)
+        padded = np.array([self.sizes[b].max() * len(b) for b in batches], dtype=np.float64)
+        budget = np.maximum(nodes, self.max_nodes)
+        return {
+            'batches': len(batches),
+            'graphs': int(sum(len(b) for b in batches)),
+            'nodes': int(nodes.sum()),
+            'mean_batch_nodes': float(nodes.mean()) if len(batches) else 0.0,
+            'utilization': float(nodes.sum() / budget.sum()) if len(batches) else 0.0,
+            'waste': float(1 - nodes.sum() / budget.sum()) if len(batches) else 0.0,
+            'padding': float(1 - nodes.sum() / padded.sum()) if len(batches) else 0.0,
+        }
+
+    def __iter__(self):
+        # len() may already have planned this epoch; stats describe the batches actually served
+        batches = self.batches if self.batches is not None else self._build()
+        self.batches = None
+        self.stats = self.batch_stats(batches)
+        return iter(batches)
+
+    def __len__(self):
+        if self.batches is None:
+            self._build()
+        return len(self.batches)
@@ -0,0 +1,107 @@
+# engine/storage.py
+import io
+import torch
+from engine.profiler import profiler
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+try:
+    import lz4.frame
+except ImportError:
+    lz4 = None
+
+MAGIC = {'zstd': b'PGZS', 'lz4': b'PGL4'}
+X_DTYPES = (None, 'float16', 'quant16')
+
+def pack_tensors(tensors, x_dtype=None):
+    # int64 tensors that fit are stored as int32; float tensors as float16 or as
+    # 16-bit per-column quantized values (min + scale), depending on x_dtype.
+    # float16 keeps ~3 significant digits, i.e. 1-2 px steps for raw coordinates above 1024;
+    # quant16 spreads 65536 levels over each column's range instead.
+    packed, meta = {}, {}
+    for key, value in tensors.items():
+        if not isinstance(value, torch.Tensor):
+            packed[key] = value
+        elif value.dtype == torch.long and value.numel() and \
+                value.min() >= torch.iinfo(torch.int32).min and value.max() <= torch.iinfo(torch.int32).max:
+            packed[key], meta[key] = value.to(torch.int32), ('int32', value.dtype)
+        elif value.dtype == torch.long:
+            packed[key] = value
+        elif value.is_floating_point() and x_dtype == 'float16':
+            packed[key], meta[key] = value.to(torch.float16), ('float16', value.dtype)
+        elif value.is_floating_point() and x_dtype == 'quant16' and value.numel():
+            columns = value.reshape(value.size(0), -1)
+            low = columns.min(dim=0).values
+            scale = (columns.max(dim=0).values - low) / 65535
+            scale = torch.where(scale > 0, scale, torch.ones_like(scale))
+            quantized = torch.round((columns - low) / scale) - 32768
+            packed[key] = quantized.to(torch.int16)
+            meta[key] = ('quant16', value.dtype, tuple(value.shape), low, scale)
+        else:
+            packed[key] = value
+    return packed, meta
+
+def unpack_tensors(packed, meta):
+    tensors = dict(packed)
+    for key, info in meta.items():
+        value = packed[key]
+        if info[0] == 'quant16':
+            _, dtype, shape, low, scale = info
+            tensors[key] = ((value.to(dtype) + 32768) * scale + low).reshape(shape)
+        else:
+            tensors[key] = value.to(info[1])
+    return tensors
+
+def write(obj, path, compression=None):
+    # Uncompressed files stay plain torch.save archives so they can still be memory-mapped
+    if compression is None:
+        torch.save(obj, path)
+        return
+    buffer = io.BytesIO()
+    torch.save(obj, buffer)
+    raw = buffer.getvalue()
+    if compression == 'zstd':
+        if zstandard is None:
+            raise ImportError("compression='zstd' needs the zstandard package")
+        payload = zstandard.ZstdCompressor(level=3).compress(raw)
+    elif compression == 'lz4':
+        if lz4 is None:
+            raise ImportError("compression='lz4' needs the lz4 package")
+        payload = lz4.frame.compress(raw)
+    else:
+        raise ValueError(f"compression must be None, 'zstd' or 'lz4', got {compression!r}")
+    with open(path, 'wb') as f:
+        f.write(MAGIC[compression] + payload)
+
+def read(path, mmap=False):
+    with open(path, 'rb') as f:
+        head = f.read(4)
+    if head == MAGIC['zstd']:
+        with open(path, 'rb') as f:
+            raw = zstandard.ZstdDecompressor().decompress(f.read()[4:])
+        return torch.load(io.BytesIO(raw), weights_only=False)
+    if head == MAGIC['lz4']:
+        with open(path, 'rb') as f:
+            raw = lz4.frame.decompress(f.read()[4:])
+        return torch.load(io.BytesIO(raw), weights_only=False)
+    kwargs = {'mmap': True} if mmap else {}
+    return torch.load(path, weights_only=False, **kwargs)
+
+@profiler.timed('save')
+def save_graph(data, path, x_dtype=None, compression=None):
+    if x_dtype is None and compression is None:
+        torch.save(data, path)
+        return
+    tensors, meta = pack_tensors(data.to_dict(), x_dtype)
+    write({'packed': tensors, 'meta': meta, 'cls': data.__class__}, path, compression)
+
+@profiler.timed('load_graph')
+def load_graph(path, mmap=False):
+    # Plain and packed files load the same way; packed tensors are upcast to their original dtypes
+    obj = read(path, mmap)
+    if isinstance(obj, dict) and 'packed' in obj:
+        return obj['cls'].from_dict(unpack_tensors(obj['packed'], obj['meta']))
+    return obj
@@ -0,0 +1,101 @@
+# engine/subgraph.py
+import torch
+from torch_geometric.data import Data
+from torch_geometric.utils import subgraph
+from engine.adjacency import add_adjacency
+
+def partition_nodes(pos, max_nodes):
+    # Recursive coordinate bisection: split every part at the median of its wider axis
+    # until no part holds more than max_nodes nodes. Returns a part id per node.
+    if max_nodes < 1:
+        raise ValueError(f'max_nodes must be at least 1, got {max_nodes}')
+    parts = [torch.arange(pos.size(0))]
+    done = []
+    while parts:
+        nodes = parts.pop()
+        if nodes.numel() <= max_nodes:
+            if nodes.numel():
+                done.append(nodes)
+            continue
+        coords = pos[nodes]
+        axis = int(torch.argmax(coords.max(dim=0).values - coords.min(dim=0).values))
+        order = torch.argsort(coords[:, axis], stable=True)
+        half = nodes.numel() // 2
+        parts.append(nodes[order[:half]])
+        parts.append(nodes[order[half:]])
+
+    part = torch.empty(pos.size(0), dtype=torch.long)
+    for i, nodes in enumerate(sorted(done, key=lambda n: int(n.min()))):
+        part[nodes] = i
+    return part
+
+def expand_hops(mask, edge_index, num_hops):
+    # Grow a node mask by num_hops along edges in both directions
+    row, col = edge_index
+    for _ in range(num_hops):
+        grown = mask.clone()
+        grown[col[mask[row]]] = True
+        grown[row[mask[col]]] = True
+        mask = grown
+    return mask
+
+def make_subgraph(data, part, i, num_hops=1):
+    # Part i of a partition_nodes() vector, with its num_hops halo
+    center = part == i
+    subset = expand_hops(center, data.edge_index, num_hops)
+    edge_attr = getattr(data, 'edge_attr', None)
+    edge_index, sub_attr = subgraph(subset, data.edge_index, edge_attr, relabel_nodes=True,
+                                    num_nodes=data.num_nodes)
+    sub = Data(x=data.x[subset], edge_index=edge_index, n_id=subset.nonzero().view(-1),
+               center_mask=center[subset])
+    if sub_attr is not None:
+        sub.edge_attr = sub_attr
+    if 'gcn_weight' in data:
+        # The cached normalization depends on degrees, so it is recomputed per part
+        add_adjacency(sub)
+    return sub
+
+def make_subgraphs(data, max_nodes, num_hops=1, coord_dims=(0, 1)):
+    # Cluster-style subgraphs of one plan: each part owns at most max_nodes "center" nodes
+    # and carries a num_hops halo of neighbours for message passing. n_id maps subgraph
+    # nodes back to the original graph; predictions are only kept for center nodes.
+    part = partition_nodes(data.x[:, list(coord_dims)], max_nodes)
+    return [make_subgraph(data, part, i, num_hops) for i in range(int(part.max()) + 1 if part.numel() else 0)]
+
+def stitch_predictions(subgraphs, outputs, num_nodes):
+    # Scatter every part's center-node outputs back into one tensor for the whole plan
+    first = outputs[0]
+    stitched = first.new_zeros((num_nodes,) + tuple(first.shape[1:]))
+    for sub, out in zip(subgraphs, outputs):
+        stitched[sub.n_id[sub.center_mask]] = out[sub.center_mask]
+    return stitched
+
+class SubgraphDataset:
+    # Flattens (graph, part) pairs of a dataset into one indexable sequence, so Trainer and
+    # DataLoader can train on bounded-size pieces of large plans. Only the partition vector
+    # of every graph is kept; a part is cut from its graph when it is requested.
+    def __init__(self, dataset, max_nodes, num_hops=1, coord_dims=(0, 1)):
+        self.dataset = dataset
+        self.num_hops = num_hops
+        self.parts = []
+        self.items = []
+        self.sizes = []
+        for idx in range(len(dataset)):
+            data = dataset[idx]
+            part = partition_nodes(data.x[:, list(coord_dims)], max_nodes)
+            self.parts.append(part)
+            for i in range(int(part.max()) + 1 if part.numel() else 0):
+                self.items.append((idx, i))
+                self.sizes.append(int(expand_hops(part == i, data.edge_index, num_hops).sum()))
+
+    def graph_sizes(self):
+        return list(self.sizes)
+
+    def __len__(self):
+        return len(self.items)
+
+    def __getitem__(self, idx):
+        graph_idx, i = self.items[idx]
+        sub = make_subgraph(self.dataset[graph_idx], self.parts[graph_idx], i, self.num_hops)
+        sub.graph_idx = graph_idx
+        return sub
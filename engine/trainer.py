@@ -0,0 +1,115 @@
+# engine/trainer.py
+import os
+import time
+import torch
+from torch_geometric.loader import DataLoader
+from engine.sampler import NodeBudgetBatchSampler
+
+class Trainer:
+    # Mini-batch training over a PoseGraphDataset (or any PyG dataset).
+    # model(batch) is called on a collated Batch and loss_fn(output, batch) must return a scalar.
+    # max_nodes switches from fixed-size batches to NodeBudgetBatchSampler.
+    def __init__(self, model, dataset, loss_fn, optimizer=None, lr=1e-3, batch_size=32, shuffle=True,
+                 num_workers=0, pin_memory=False, accumulation_steps=1, checkpoint_dir=None, device='cpu',
+                 max_nodes=None):
+        self.model = model.to(device)
+        self.dataset = dataset
+        self.loss_fn = loss_fn
+        self.optimizer = optimizer or torch.optim.Adam(model.parameters(), lr=lr)
+        self.batch_size = batch_size
+        self.shuffle = shuffle
+        self.num_workers = num_workers
+        self.pin_memory = pin_memory
+        self.accumulation_steps = max(1, accumulation_steps)
+        self.checkpoint_dir = checkpoint_dir
+        self.max_nodes = max_nodes
+        self.sampler = None
+        self.device = torch.device(device)
+        self.start_epoch = 1
+        self.history = []
+
+    def make_loader(self):
+        if self.max_nodes is not None:
+            sizes = self.dataset.graph_sizes() if hasattr(self.dataset, 'graph_sizes') else \
+                [data.num_nodes for data in self.dataset]
+            self.sampler = NodeBudgetBatchSampler(sizes, self.max_nodes, shuffle=self.shuffle)
+            return DataLoader(self.dataset, batch_sampler=self.sampler, num_workers=self.num_workers,
+                              pin_memory=self.pin_memory, persistent_workers=self.num_workers > 0)
+        return DataLoader(self.dataset, batch_size=self.batch_size, shuffle=self.shuffle,
+                          num_workers=self.num_workers, pin_memory=self.pin_memory,
+                          persistent_workers=self.num_workers > 0)
+
+    def train_epoch(self, loader, epoch):
+        self.model.train()
+        self.optimizer.zero_grad()
+        total_loss = 0.0
+        graphs = nodes = steps = 0
+        start = time.perf_counter()
+
+        for step, batch in enumerate(loader, 1):
+            batch = batch.to(self.device, non_blocking=self.pin_memory)
+            loss = self.loss_fn(self.model(batch), batch)
+            # Scale so that accumulated gradients average over the effective batch
+            (loss / self.accumulation_steps).backward()
+            if step % self.accumulation_steps == 0:
+                self.optimizer.step()
+                self.optimizer.zero_grad()
+
+            total_loss += loss.item() * batch.num_graphs
+            graphs += batch.num_graphs
+            nodes += batch.num_nodes
+            steps = step
+
+        if steps % self.accumulation_steps:
+            self.optimizer.step()
+            self.optimizer.zero_grad()
+
+        elapsed = time.perf_counter() - start
+        metrics = {
+            'epoch': epoch,
+            'loss': total_loss / max(graphs, 1),
+            'graphs': graphs,
+            'nodes': nodes,
+            'seconds': elapsed,
+            'graphs_per_sec': graphs / elapsed if elapsed > 0 else 0.0,
+            'nodes_per_sec': nodes / elapsed if elapsed > 0 else 0.0,
+        }
+        if self.sampler is not None:
+            metrics['batching'] = self.sampler.stats
+        return metrics
+
+    def fit(self, epochs):
+        loader = self.make_loader()
+        for epoch in range(self.start_epoch, epochs + 1):
+            metrics = self.train_epoch(loader, epoch)
+            self.history.append(metrics)
+            print(f"Epoch {epoch}: loss {metrics['loss']:.4f}, "
+                  f"{metrics['graphs_per_sec']:.1f} graphs/sec, {metrics['nodes_per_sec']:.0f} nodes/sec")
+            if 'batching' in metrics:
+                stats = metrics['batching']
+                print(f"  {stats['batches']} batches, utilization {stats['utilization']:.1%}, "
+                      f"waste {stats['waste']:.1%}, padding {stats['padding']:.1%}")
+            if self.checkpoint_dir is not None:
+                self.save_checkpoint(epoch)
+        return self.history
+
+    def save_checkpoint(self, epoch):
+        os.makedirs(self.checkpoint_dir, exist_ok=True)
+        path = os.path.join(self.checkpoint_dir, f'checkpoint_{epoch}.pt')
+        torch.save({
+            'epoch': epoch,
+            'model': self.model,
+            'model_state': self.model.state_dict(),
+            'optimizer_state': self.optimizer.state_dict(),
+            'history': self.history,
+        }, path)
+        return path
+
+    def load_checkpoint(self, path):
+        # Resume: the next fit() continues from the epoch after the saved one
+        checkpoint = torch.load(path, map_location=self.device, weights_only=False)
+        self.model.load_state_dict(checkpoint['model_state'])
+        self.optimizer.load_state_dict(checkpoint['optimizer_state'])
+        self.history = checkpoint.get('history', [])
+        self.start_epoch = checkpoint['epoch'] + 1
+        return checkpoint
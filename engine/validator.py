@@ -0,0 +1,71 @@
+# engine/validator.py
+import numpy as np
+from engine.profiler import profiler
+
+VALIDATION_MODES = (None, 'report', 'drop', 'repair')
+
+@profiler.timed('validate')
+def validate_segments(segments, size=None, mode='report'):
+    # Row-level checks on the (N, 4) Start X/Start Y/End X/End Y block:
+    # NaN/inf coordinates, zero-length segments and endpoints outside (0..Image Width, 0..Image Height).
+    # 'report' only counts, 'drop' removes offending rows, 'repair' clips out-of-bounds
+    # endpoints into the image and drops what cannot be fixed.
+    # A non-finite size (e.g. csv_maker output for JSON without an image size) counts as
+    # unknown: bounds are neither checked nor clipped, and missing_size is reported.
+    segments = np.asarray(segments, dtype=np.float64)
+    missing_size = size is not None and not np.isfinite(np.asarray(size, dtype=np.float64)).all()
+    if missing_size:
+        size = None
+    invalid = ~np.isfinite(segments).all(axis=1)
+    zero_length = ~invalid & (segments[:, 0] == segments[:, 2]) & (segments[:, 1] == segments[:, 3])
+    out_of_bounds = np.zeros(len(segments), dtype=bool)
+    if size is not None:
+        points = segments.reshape(-1, 2, 2)
+        outside = (points < 0) | (points > np.asarray(size, dtype=np.float64))
+        out_of_bounds = ~invalid & outside.any(axis=(1, 2))
+
+    report = {
+        'rows': len(segments),
+        'nan': int(invalid.sum()),
+        'zero_length': int(zero_length.sum()),
+        'out_of_bounds': int(out_of_bounds.sum()),
+        'missing_size': int(missing_size),
+    }
+    if mode == 'drop':
+        segments = segments[~(invalid | zero_length | out_of_bounds)]
+    elif mode == 'repair':
+        segments = segments[~invalid]
+        if size is not None:
+            segments = np.clip(segments.reshape(-1, 2, 2), 0, np.asarray(size, dtype=np.float64)).reshape(-1, 4)
+        # Clipping can collapse a segment onto the image border
+        segments = segments[~((segments[:, 0] == segments[:, 2]) & (segments[:, 1] == segments[:, 3]))]
+    report['dropped_rows'] = report['rows'] - len(segments)
+    return segments, report
+
+@profiler.timed('validate')
+def validate_edges(edges, mode='report', edge_attr=None, reported_loops=0):
+    # Edge-level checks after node deduplication/snapping: self-loops and duplicate walls.
+    # An edge is a duplicate when the same node pair (in either direction) appeared earlier.
+    # Per-edge attributes, if given, are dropped together with their edges.
+    # reported_loops self-loops were already counted as zero_length rows by validate_segments
+    # (every such row becomes one self-loop in 'report' mode) and are left out of self_loops,
+    # so that summing the counts does not count a defect twice.
+    edges = np.asarray(edges).reshape(-1, 2)
+    self_loops = edges[:, 0] == edges[:, 1]
+    duplicates = np.zeros(len(edges), dtype=bool)
+    if len(edges):
+        _, first = np.unique(np.sort(edges, axis=1), axis=0, return_index=True)
+        duplicates[:] = True
+        duplicates[first] = False
+    bad = self_loops | duplicates
+    report = {
+        'self_loops': int(self_loops.sum()) - reported_loops,
+        'duplicate_edges': int((duplicates & ~self_loops).sum()),
+        'dropped_edges': 0,
+    }
+    if mode in ('drop', 'repair'):
+        edges = edges[~bad]
+        if edge_attr is not None:
+            edge_attr = edge_attr[~bad]
+        report['dropped_edges'] = int(bad.sum())
+    return edges, edge_attr, report
@@ -0,0 +1,147 @@
+# infer.py
+import argparse
+import importlib.util
+import os
+import time
+import numpy as np
+import pandas as pd
+import torch
+from torch_geometric.data import Batch
+from engine.data_loader import list_files
+from engine.data_normalizer import FeatureStats
+from engine.dataset import build_graph, read_raw
+from engine.subgraph import make_subgraphs, stitch_predictions
+
+def load_model(path):
+    # Accepts a Trainer checkpoint or a module saved with torch.save(model)
+    checkpoint = torch.load(path, map_location='cpu', weights_only=False)
+    model = checkpoint['model'] if isinstance(checkpoint, dict) else checkpoint
+    model.eval()
+    return model
+
+def predict_in_parts(model, graph, max_nodes, num_hops):
+    # Forward pass per bounded-size subgraph; node outputs are stitched back together
+    subgraphs = make_subgraphs(graph, max_nodes, num_hops)
+    with torch.inference_mode():
+        outputs = [model(Batch.from_data_list([sub])) for sub in subgraphs]
+    return stitch_predictions(subgraphs, outputs, graph.num_nodes)
+
+def prediction_frame(output, batch, names):
+    output = output.detach().cpu().reshape(output.size(0), -1).numpy()
+    columns = {f'pred_{k}': output[:, k] for k in range(output.shape[1])}
+    if output.shape[0] == batch.num_nodes:
+        # Node-level predictions: one row per node
+        graph = batch.batch.cpu().numpy()
+        counts = np.bincount(graph, minlength=batch.num_graphs)
+        node = np.arange(batch.num_nodes) - np.repeat(np.cumsum(counts) - counts, counts)
+        if 'orig_id' in batch:
+            # Simplified graphs report node ids from before the collinear nodes were removed
+            node = batch.orig_id.cpu().numpy()
+        return pd.DataFrame({'file': np.asarray(names)[graph], 'node': node, **columns})
+    return pd.DataFrame({'file': names, **columns})
+
+def parquet_available():
+    return any(importlib.util.find_spec(engine) is not None for engine in ('pyarrow', 'fastparquet'))
+
+def write_output(frame, path):
+    if path.endswith('.parquet'):
+        frame.to_parquet(path, index=False)
+    else:
+        frame.to_csv(path, index=False)
+
+def main():
+    parser = argparse.ArgumentParser(description='Run a trained GNN over floor-plan CSVs')
+    parser.add_argument('--model', required=True, help='Trainer checkpoint or saved model')
+    parser.add_argument('--csv', default=os.path.join('csv_data', '*.csv'), help='glob of CSV files')
+    parser.add_argument('--json', default=None, help='glob of junction/wall annotation JSON files, used instead of --csv')
+    parser.add_argument('--output', default='predictions.csv',
+                        help='.csv or .parquet output file (.parquet needs pyarrow or fastparquet)')
+    parser.add_argument('--batch-size', type=int, default=32)
+    parser.add_argument('--threads', type=int, default=None, help='torch intra-op threads')
+    parser.add_argument('--snap-epsilon', type=float, default=None)
+    parser.add_argument('--normalization', choices=['graph', 'global', 'none'], default='graph')
+    parser.add_argument('--stats', default=None, help='feature_stats.json for --normalization global')
+    parser.add_argument('--node-features', nargs='+', default=['xy'])
+    parser.add_argument('--edge-features', nargs='*', default=[])
+    parser.add_argument('--validation', choices=['report', 'drop', 'repair'], default=None)
+    parser.add_argument('--simplify-tol', type=float, default=None,
+                        help='collapse collinear degree-2 nodes within this many degrees')
+    parser.add_argument('--adjacency', action='store_true', help='attach the precomputed GCN adjacency')
+    parser.add_argument('--max-nodes', type=int, default=None,
+                        help='split graphs larger than this into subgraphs (node-level models only)')
+    parser.add_argument('--num-hops', type=int, default=2, help='halo size of each subgraph')
+    args = parser.parse_args()
+    # Fail before scoring anything rather than after every graph has been run
+    if args.output.endswith('.parquet') and not parquet_available():
+        parser.error('--output .parquet needs pyarrow or fastparquet; install one or write a .csv')
+
+    if args.threads:
+        torch.set_num_threads(args.threads)
+    if args.normalization == 'global' and args.stats is None:
+        parser.error('--normalization global needs --stats')
+    if args.normalization != 'global' and args.stats is not None:
+        parser.error(f'--stats only applies to --normalization global, not {args.normalization}')
+    stats = FeatureStats.load(args.stats) if args.normalization == 'global' else None
+    params = {
+        'snap_epsilon': args.snap_epsilon,
+        'normalization': args.normalization,
+        'node_features': args.node_features,
+        'edge_features': args.edge_features,
+        'validation': args.validation,
+        'simplify_tol': args.simplify_tol,
+        'adjacency': args.adjacency,
+        'raw_format': 'csv' if args.json is None else 'json',
+    }
+    model = load_model(args.model)
+    pattern = args.csv if args.json is None else args.json
+
+    frames = []
+    latencies = []
+    pending, names, build_times = [], [], []
+    start = time.perf_counter()
+
+    def flush():
+        batch = Batch.from_data_list(pending)
+        tic = time.perf_counter()
+        with torch.inference_mode():
+            output = model(batch)
+        share = (time.perf_counter() - tic) / len(pending)
+        latencies.extend(t + share for t in build_times)
+        frames.append(prediction_frame(output, batch, names))
+        pending.clear()
+        names.clear()
+        build_times.clear()
+
+    for file in list_files(pattern):
+        tic = time.perf_counter()
+        graph, _ = build_graph(read_raw(file, params), **params)
+        if stats is not None:
+            graph.x = stats.transform(graph.x)
+        build_time = time.perf_counter() - tic
+        if args.max_nodes and graph.num_nodes > args.max_nodes:
+            tic = time.perf_counter()
+            output = predict_in_parts(model, graph, args.max_nodes, args.num_hops)
+            latencies.append(build_time + time.perf_counter() - tic)
+            frames.append(prediction_frame(output, Batch.from_data_list([graph]), [os.path.basename(file)]))
+            continue
+        build_times.append(build_time)
+        pending.append(graph)
+        names.append(os.path.basename(file))
+        if len(pending) == args.batch_size:
+            flush()
+    if pending:
+        flush()
+
+    if not frames:
+        print(f'No files matched {pattern}')
+        return
+    write_output(pd.concat(frames, ignore_index=True), args.output)
+
+    elapsed = time.perf_counter() - start
+    p50, p90, p99 = np.percentile(np.array(latencies) * 1000, [50, 90, 99])
+    print(f'Scored {len(latencies)} graphs in {elapsed:.2f}s ({len(latencies) / elapsed:.1f} graphs/sec)')
+    print(f'Per-graph latency: p50 {p50:.2f} ms, p90 {p90:.2f} ms, p99 {p99:.2f} ms')
+    print(f'Predictions written to {args.output}')
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+import os
+import csv
+import errno
+import shutil
+
+# How accepted layer images are materialized:
+#   copy      a full copy (the old behaviour)
+#   hardlink  a hard link, falling back to a copy across filesystems
+#   reflink   a copy-on-write clone (btrfs, XFS), falling back to a copy
+#   manifest  nothing on disk; the accepted paths are only listed in the manifest
+OUTPUT_MODES = ('copy', 'hardlink', 'reflink', 'manifest')
+MANIFEST_COLUMNS = ['path', 'class', 'confidence']
+
+FICLONE = 0x40049409  # linux/fs.h
+
+def reflink(src, dst):
+    import fcntl
+    with open(src, 'rb') as source, open(dst, 'wb') as target:
+        fcntl.ioctl(target.fileno(), FICLONE, source.fileno())
+    shutil.copystat(src, dst)
+
+def place(src, dest_dir, mode='copy'):
+    # Put src into dest_dir under its own name and return the new path (None for 'manifest')
+    if mode not in OUTPUT_MODES:
+        raise ValueError(f'output mode must be one of {OUTPUT_MODES}, got {mode!r}')
+    if mode == 'manifest':
+        return None
+    dst = os.path.join(dest_dir, os.path.basename(src))
+    # A rerun with dest_dir inside the scanned source finds the files it placed before;
+    # removing dst would then delete src itself
+    if os.path.exists(dst) and os.path.samefile(src, dst):
+        return dst
+    if mode != 'copy':
+        if os.path.lexists(dst):
+            os.remove(dst)
+        try:
+            if mode == 'hardlink':
+                os.link(src, dst)
+            else:
+                reflink(src, dst)
+            return dst
+        except (OSError, ImportError) as error:
+            # Different filesystem, no clone support or no link permission: copy instead
+            if isinstance(error, OSError) and error.errno not in (errno.EXDEV, errno.EOPNOTSUPP, errno.ENOTTY,
+                                                                  errno.EINVAL, errno.EPERM, errno.EMLINK):
+                raise
+            if os.path.lexists(dst):
+                os.remove(dst)
+    shutil.copy2(src, dst)
+    return dst
+
+class ManifestWriter:
+    # CSV of accepted images (path, class, confidence) written as results come in
+    def __init__(self, path):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.file = open(path, 'w', encoding='utf-8', newline='')
+        self.writer = csv.writer(self.file)
+        self.writer.writerow(MANIFEST_COLUMNS)
+
+    def add(self, path, label, confidence):
+        self.writer.writerow([path, label, confidence])
+
+    def close(self):
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def read_manifest(path, classes=None):
+    # Accepted (path, class, confidence) rows, optionally only for some classes
+    with open(path, encoding='utf-8', newline='') as f:
+        rows = [(row['path'], row['class'], float(row['confidence'])) for row in csv.DictReader(f)]
+    if classes is not None:
+        rows = [row for row in rows if row[1] in classes]
+    return rows
@@ -3,8 +3,8 @@ import numpy as np
 import matplotlib.pyplot as plt
 from ultralytics import YOLO
 import os
-import shutil
 import colorsys
+from layer_output import ManifestWriter, place, read_manifest
 
 # Initialize YOLO models once
 model_classification = YOLO("./models/classification_best.pt")
@@ -17,6 +17,12 @@ classify_dir = './cad_data/'
 desired_class = ['door_normal', 'window']
 classification_class = ["door", "window"]
 classification_threshold = 0.999
+# 'copy', 'hardlink', 'reflink' or 'manifest' (see layer_output.py). In 'manifest' mode no
+# image is duplicated: accepted layers are only listed in layer_manifest, the layer loop
+# reads them from there, and similar layers are listed in result_manifest.
+output_mode = 'copy'
+layer_manifest = './filtered_layers.csv'
+result_manifest = os.path.join(result_dir, 'similar_layers.csv')
 
 # Initialize colors
 hsv_tuples = [(x / len(desired_class), 1., 1.) for x in range(len(desired_class))]
@@ -27,26 +33,30 @@ colors = list(map(lambda x: (int(x[0] * 255), int(x[1] * 255), int(x[2] * 255)),
 os.makedirs(result_dir, exist_ok=True)
 original_detection_dir = os.path.join('original_detection')
 os.makedirs(original_detection_dir, exist_ok=True)
-os.makedirs(layer_dir, exist_ok=True)
-
-# Classification and copying to filtered_layers
-for img in os.listdir(classify_dir):
-    if img.lower().endswith(('.png', '.jpg', '.jpeg')):
-        img_path_full = os.path.join(classify_dir, img)
-        results = model_classification.predict(img_path_full, imgsz=1024)
-        for result in results:
-            if hasattr(result, 'probs'):
-                top1_index = result.probs.top1
-                top1_conf = result.probs.top1conf.item()
-                classes = result.names
-                predicted_class = classes[top1_index]
-                if predicted_class in classification_class and top1_conf > classification_threshold:
-                    shutil.copy2(img_path_full, os.path.join(layer_dir, img))
-                    print(f"Image {img} has been copied to the '{layer_dir}' directory.")
-                    break
+if output_mode != 'manifest':
+    os.makedirs(layer_dir, exist_ok=True)
+
+# Classification into filtered_layers (or only into the layer manifest)
+with ManifestWriter(layer_manifest) as manifest:
+    for img in os.listdir(classify_dir):
+        if img.lower().endswith(('.png', '.jpg', '.jpeg')):
+            img_path_full = os.path.join(classify_dir, img)
+            results = model_classification.predict(img_path_full, imgsz=1024)
+            for result in results:
+                if hasattr(result, 'probs'):
+                    top1_index = result.probs.top1
+                    top1_conf = result.probs.top1conf.item()
+                    classes = result.names
+                    predicted_class = classes[top1_index]
+                    if predicted_class in classification_class and top1_conf > classification_threshold:
+                        place(img_path_full, layer_dir, output_mode)
+                        manifest.add(img_path_full, predicted_class, top1_conf)
+                        print(f"Image {img} has been accepted ({output_mode}).")
+                        break
 
 for cls in desired_class:
-    os.makedirs(os.path.join(result_dir, cls), exist_ok=True)
+    if output_mode != 'manifest':
+        os.makedirs(os.path.join(result_dir, cls), exist_ok=True)
 
 # Load the original image and perform detection
 original_img = cv2.imread(img_path)
@@ -76,10 +86,17 @@ cv2.imwrite(os.path.join(original_detection_dir, f'detected_{original_img_filena
 similar_images = {cls: [] for cls in desired_class}
 different_images = {cls: [] for cls in desired_class}
 
-# Process each image in the layer directory
-for layer_filename in os.listdir(layer_dir):
+# Layers to compare: the files in layer_dir, or the manifest entries when nothing was placed
+if output_mode == 'manifest':
+    layer_paths = [path for path, _, _ in read_manifest(layer_manifest)]
+else:
+    layer_paths = [os.path.join(layer_dir, name) for name in os.listdir(layer_dir)]
+
+# Process each layer image
+result_writer = ManifestWriter(result_manifest)
+for layer_path in layer_paths:
+    layer_filename = os.path.basename(layer_path)
     if layer_filename.lower().endswith(('.png', '.jpg', '.jpeg')):
-        layer_path = os.path.join(layer_dir, layer_filename)
         layer_img_original = cv2.imread(layer_path)
         layer_img = layer_img_original.copy()
 
@@ -121,12 +138,15 @@ for layer_filename in os.listdir(layer_dir):
 
             if average_matching_score > 36:
                 similar_images[current_class].append((layer_filename, average_matching_score))
-                shutil.copy2(layer_path, os.path.join(result_dir, current_class, layer_filename))
+                place(layer_path, os.path.join(result_dir, current_class), output_mode)
+                result_writer.add(layer_path, current_class, average_matching_score)
             else:
                 different_images[current_class].append((layer_filename, average_matching_score))
 
             print(f"Processed {layer_filename} for {current_class}: Average Matching Score = {average_matching_score:.2f}%")
 
+result_writer.close()
+
 # Print summary
 for cls in desired_class:
     print(f"\nClass: {cls}")
@@ -138,6 +158,9 @@ for cls in desired_class:
     for img, score in different_images[cls]:
         print(f"{img}: {score:.2f}%")
 
-    print(f"\nSimilar images for {cls} have been copied to the '{os.path.join(result_dir, cls)}' directory.")
+    if output_mode == 'manifest':
+        print(f"\nSimilar images for {cls} are listed in '{result_manifest}'.")
+    else:
+        print(f"\nSimilar images for {cls} have been placed ({output_mode}) in the '{os.path.join(result_dir, cls)}' directory.")
 
 print(f"\nOriginal image with detections has been saved to '{original_detection_dir}'.")
@@ -1,30 +1,155 @@
 # main.py
 import os
-import torch
-from engine.dataset import PoseGraphDataset
+import sys
+import argparse
+from engine.manifest import load_manifest
+from engine.profiler import profiler
+
+# torch, torch_geometric, pandas and sklearn are only imported by the commands that
+# build or load graphs; inspect and stats read the manifest and start without them
+COMMANDS = ('process', 'inspect', 'stats')
+
+def process(args):
+    from engine.dataset import PoseGraphDataset, save_collated
+
+    if args.profile:
+        profiler.enable(cprofile=args.cprofile, memory=args.tracemalloc)
 
-def main():
     # Paths
-    root = os.path.dirname(os.path.abspath(__file__))
+    root = args.root
     data_path = os.path.join(root, 'data')
-    
+
     # Ensure data directory exists
     if not os.path.exists(data_path):
         os.makedirs(data_path)
-    
-    # Initialize and process dataset
-    dataset = PoseGraphDataset(root=root)
-    dataset.process()
-    
+
+    # Opening the dataset rebuilds whatever the manifest says is missing or outdated;
+    # --force rebuilds every graph
+    with profiler.timer('dataset.process'):
+        dataset = PoseGraphDataset(root=root, raw_format=args.raw_format)
+        if args.force:
+            dataset.process(force=True)
+
     # Print the processed data
     for i in range(len(dataset)):
         data = dataset[i]
         print(f'Graph {i}:', data)
-    
-    # Save processed data
-    for i in range(len(dataset)):
-        data = dataset[i]
-        torch.save(data, os.path.join(data_path, f'processed_data_{i}.pt'))
+
+    # Save processed data as a single collated file
+    data_list = [dataset[i] for i in range(len(dataset))]
+    save_collated(data_list, os.path.join(data_path, 'processed_data.pt'))
+
+    if args.profile:
+        profiler.disable()
+        profiler.dump(args.profile_output)
+        print(profiler.summary())
+        print(f'Profile written to {args.profile_output}')
+
+def read_manifest(root):
+    manifest = load_manifest(os.path.join(root, 'processed'))
+    if manifest is None:
+        sys.exit(f'No processed graphs under {root}, run "python main.py process" first')
+    return manifest
+
+def open_dataset(root, manifest):
+    # Reopen with the settings of the last process() run so nothing is rebuilt
+    from engine.dataset import PoseGraphDataset
+    return PoseGraphDataset(root=root, storage=manifest.get('storage', 'files'), **manifest['params'],
+                            **manifest.get('storage_options', {}))
+
+def inspect(args):
+    manifest = read_manifest(args.root)
+    if args.graph is not None:
+        data = open_dataset(args.root, manifest)[args.graph]
+        print(f"Graph {args.graph} ({manifest['graphs'][args.graph]['file']}):", data)
+        for key, value in data.items():
+            print(f'  {key}: {tuple(value.shape)} {value.dtype}')
+        return
+
+    print(f"storage: {manifest.get('storage', 'files')} {manifest.get('storage_options', {})}")
+    print(f"params: {manifest['params']}")
+    print(f"{'graph':>5}  {'nodes':>7}  {'edges':>7}  file")
+    for i, entry in enumerate(manifest['graphs']):
+        report = entry.get('report', {})
+        issues = {key: value for key, value in report.get('validation', {}).items() if key != 'rows' and value}
+        line = f"{i:>5}  {report.get('num_nodes', '?'):>7}  {report.get('num_edges', '?'):>7}  {entry['file']}"
+        if issues:
+            line += '  | ' + ', '.join(f'{key} {value}' for key, value in issues.items())
+        print(line)
+
+def stats(args):
+    manifest = read_manifest(args.root)
+    reports = [entry.get('report', {}) for entry in manifest['graphs']]
+    print(f'graphs: {len(reports)}')
+    for key in ('num_nodes', 'num_edges'):
+        values = [report[key] for report in reports if key in report]
+        if values:
+            print(f'{key[4:]}: total {sum(values)}, min {min(values)}, '
+                  f'mean {sum(values) / len(values):.1f}, max {max(values)}')
+    unknown = sum(report.get('unknown_walls', 0) for report in reports)
+    if unknown:
+        print(f'walls with unknown junctions: {unknown}')
+    merged = [report['merged'] for report in reports if 'merged' in report]
+    if merged:
+        print(f'merged nodes: {sum(merged)}')
+    simplified = [report['simplify'] for report in reports if 'simplify' in report]
+    if simplified:
+        for key in ('nodes', 'edges'):
+            before = sum(simplify[key] for simplify in simplified)
+            removed = sum(simplify[f'removed_{key}'] for simplify in simplified)
+            print(f'simplified {key}: {before} -> {before - removed} ({removed / max(before, 1):.1%} fewer)')
+    validation = {}
+    for report in reports:
+        for key, value in report.get('validation', {}).items():
+            validation[key] = validation.get(key, 0) + value
+    if validation:
+        print('validation: ' + ', '.join(f'{key} {value}' for key, value in validation.items()))
+
+    processed_dir = os.path.join(args.root, 'processed')
+    size = sum(entry.stat().st_size for entry in os.scandir(processed_dir) if entry.is_file())
+    print(f'processed size: {size / 2 ** 20:.2f} MiB')
+
+    from engine.data_normalizer import STATS_NAME, FeatureStats
+    path = os.path.join(processed_dir, STATS_NAME)
+    if os.path.exists(path):
+        feature_stats = FeatureStats.load(path)
+        print(f'feature stats over {feature_stats.count} nodes:')
+        for column, (mean, std) in enumerate(zip(feature_stats.mean, feature_stats.std)):
+            print(f'  x[:, {column}] mean {mean:.4f} std {std:.4f}')
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Process csv_data into graphs and inspect the results')
+    root_help = 'directory holding csv_data/ (or json_data/) and processed/'
+    parser.add_argument('--root', default=os.path.dirname(os.path.abspath(__file__)), help=root_help)
+    commands = parser.add_subparsers(dest='command')
+    # --root is accepted before or after the command; the subcommand copy has no default of
+    # its own so it does not overwrite a value given before the command
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument('--root', default=argparse.SUPPRESS, help=root_help)
+
+    process_parser = commands.add_parser('process', parents=[common], help='build graphs from csv_data (default)')
+    process_parser.add_argument('--raw-format', choices=['csv', 'json'], default='csv',
+                                help='read csv_data/*.csv or the annotation JSON in json_data/*.json')
+    process_parser.add_argument('--force', action='store_true', help='rebuild every graph, even unchanged ones')
+    process_parser.add_argument('--profile', action='store_true', help='time every pipeline stage')
+    process_parser.add_argument('--profile-output', default='profile.json', help='where --profile writes its JSON')
+    process_parser.add_argument('--cprofile', action='store_true', help='add a cProfile listing to the profile')
+    process_parser.add_argument('--tracemalloc', action='store_true', help='track peak Python memory in the profile')
+    process_parser.set_defaults(run=process)
+
+    inspect_parser = commands.add_parser('inspect', parents=[common], help='list processed graphs from the manifest')
+    inspect_parser.add_argument('--graph', type=int, default=None, help='load and describe one graph')
+    inspect_parser.set_defaults(run=inspect)
+
+    stats_parser = commands.add_parser('stats', parents=[common], help='summarize processed graphs and feature statistics')
+    stats_parser.set_defaults(run=stats)
+
+    # Plain "python main.py [--profile ...]" keeps processing, as before the subcommands
+    argv = sys.argv[1:] if argv is None else list(argv)
+    if not any(arg in COMMANDS or arg in ('-h', '--help') for arg in argv):
+        argv = ['process'] + argv
+    args = parser.parse_args(argv)
+    args.run(args)
 
 if __name__ == "__main__":
     main()
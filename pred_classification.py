@@ -1,44 +1,124 @@
-import os
-from ultralytics import YOLO
-import shutil
-
-# Load the model
-model = YOLO('./runs/classify/train/weights/best.pt')
-desired_classes = ['wall', 'window', 'door', 'symbol']
-probability_threshold = 0.995
-image_paths = []
-
-# Collect all image paths from the test directory and its subdirectories
-for root, dirs, files in os.walk('./cad_data'):
-    for file in files:
-        if file.endswith(('.jpg', '.jpeg', '.png')):  # Adjust extensions as needed
-            image_paths.append(os.path.join(root, file))
-
-# Directory to save the filtered images
-filtered_dir = './filtered_layers'
-os.makedirs(filtered_dir, exist_ok=True)
-
-# Open a text file to save the results with UTF-8 encoding
-with open('classification_results.txt', 'w', encoding='utf-8') as result_file:
-    # Perform inference on each image and filter based on the predicted class and probability
-    for image_path in image_paths:
-        results = model(image_path, imgsz=1024)
-        
-        for result in results:
-            # Check if the result has the 'probs' attribute
-            if hasattr(result, 'probs'):
-                top1_index = result.probs.top1
-                top1_conf = result.probs.top1conf.item()  # Get the confidence score as a float
-                classes = result.names
-                predicted_class = classes[top1_index]
-
-                if predicted_class in desired_classes and top1_conf >= probability_threshold:
-                    shutil.copy(image_path, filtered_dir)
-                    result_text = f"Image: {image_path}, Class: {predicted_class}, Probability: {top1_conf}\n"
-                else:
-                    result_text = f"Image: {image_path}, Class: {predicted_class}, Probability: {top1_conf} - Ignored\n"
-
-                # Write the result to the text file
-                result_file.write(result_text)
-            else:
-                result_file.write(f"Image: {image_path}, No probabilities found in results\n")
+import os
+import time
+import queue
+import argparse
+import threading
+import concurrent.futures
+import cv2
+from ultralytics import YOLO
+from layer_output import OUTPUT_MODES, ManifestWriter, place
+
+desired_classes = ['wall', 'window', 'door', 'symbol']
+probability_threshold = 0.995
+image_extensions = ('.jpg', '.jpeg', '.png')  # Adjust extensions as needed
+
+def collect_images(source):
+    # Collect all image paths from the source directory and its subdirectories
+    image_paths = []
+    for root, dirs, files in os.walk(source):
+        for file in files:
+            if file.endswith(image_extensions):
+                image_paths.append(os.path.join(root, file))
+    return image_paths
+
+def prefetch_batches(image_paths, batch_size, prefetch, decode_workers):
+    # Yields (paths, images) batches while a background thread reads and decodes the next
+    # ones; cv2 releases the GIL while decoding, so this overlaps with inference.
+    # Images that cannot be read come back as None.
+    batches = queue.Queue(maxsize=max(prefetch, 1))
+    done = object()
+
+    def produce():
+        try:
+            with concurrent.futures.ThreadPoolExecutor(max_workers=decode_workers) as executor:
+                for start in range(0, len(image_paths), batch_size):
+                    paths = image_paths[start:start + batch_size]
+                    batches.put((paths, list(executor.map(cv2.imread, paths))))
+            batches.put(done)
+        except Exception as error:
+            batches.put(error)
+
+    thread = threading.Thread(target=produce, daemon=True)
+    thread.start()
+    while True:
+        item = batches.get()
+        if item is done:
+            break
+        if isinstance(item, Exception):
+            raise item
+        yield item
+    thread.join()
+
+def main():
+    parser = argparse.ArgumentParser(description='Classify CAD layer images and keep the confident ones')
+    parser.add_argument('--weights', default='./runs/classify/train/weights/best.pt')
+    parser.add_argument('--source', default='./cad_data', help='directory searched recursively for images')
+    parser.add_argument('--filtered-dir', default='./filtered_layers', help='where accepted images are placed')
+    parser.add_argument('--output-mode', choices=OUTPUT_MODES, default='copy',
+                        help='copy, hardlink or reflink accepted images, or only list them in --manifest')
+    parser.add_argument('--manifest', default='./filtered_layers.csv',
+                        help='CSV of accepted images (path, class, confidence), written in every mode')
+    parser.add_argument('--results', default='classification_results.txt')
+    parser.add_argument('--imgsz', type=int, default=1024)
+    parser.add_argument('--batch-size', type=int, default=16, help='images per model call')
+    parser.add_argument('--prefetch', type=int, default=2, help='decoded batches kept ready ahead of the model')
+    parser.add_argument('--decode-workers', type=int, default=4, help='threads decoding each batch')
+    args = parser.parse_args()
+
+    # Load the model
+    model = YOLO(args.weights)
+    image_paths = collect_images(args.source)
+
+    # Directory to save the filtered images
+    if args.output_mode != 'manifest':
+        os.makedirs(args.filtered_dir, exist_ok=True)
+
+    accepted = 0
+    infer_time = 0.0
+    start = time.perf_counter()
+    # Open a text file to save the results with UTF-8 encoding
+    with open(args.results, 'w', encoding='utf-8') as result_file, ManifestWriter(args.manifest) as manifest:
+        # Perform inference batch by batch and filter based on the predicted class and probability
+        for paths, images in prefetch_batches(image_paths, args.batch_size, args.prefetch, args.decode_workers):
+            readable = [(path, image) for path, image in zip(paths, images) if image is not None]
+            for path, image in zip(paths, images):
+                if image is None:
+                    result_file.write(f"Image: {path}, Could not be read\n")
+            if not readable:
+                continue
+
+            tic = time.perf_counter()
+            results = model([image for _, image in readable], imgsz=args.imgsz, verbose=False)
+            infer_time += time.perf_counter() - tic
+
+            for (image_path, _), result in zip(readable, results):
+                # Check if the result has the 'probs' attribute
+                if getattr(result, 'probs', None) is not None:
+                    top1_index = result.probs.top1
+                    top1_conf = result.probs.top1conf.item()  # Get the confidence score as a float
+                    classes = result.names
+                    predicted_class = classes[top1_index]
+
+                    if predicted_class in desired_classes and top1_conf >= probability_threshold:
+                        place(image_path, args.filtered_dir, args.output_mode)
+                        manifest.add(image_path, predicted_class, top1_conf)
+                        accepted += 1
+                        result_text = f"Image: {image_path}, Class: {predicted_class}, Probability: {top1_conf}\n"
+                    else:
+                        result_text = f"Image: {image_path}, Class: {predicted_class}, Probability: {top1_conf} - Ignored\n"
+
+                    # Write the result to the text file
+                    result_file.write(result_text)
+                else:
+                    result_file.write(f"Image: {image_path}, No probabilities found in results\n")
+
+    elapsed = time.perf_counter() - start
+    rate = len(image_paths) / elapsed if elapsed > 0 else float('inf')
+    print(f'Classified {len(image_paths)} images in {elapsed:.2f}s ({rate:.1f} images/sec, '
+          f'batch size {args.batch_size}), accepted {accepted}')
+    print(f'Model time {infer_time:.2f}s, other (waiting on decoding, copying, writing) '
+          f'{max(elapsed - infer_time, 0):.2f}s')
+    print(f'Results written to {args.results}, accepted images listed in {args.manifest}')
+
+if __name__ == '__main__':
+    main()